@@ -0,0 +1,223 @@
+import asyncio
+import copy
+import sys
+import threading
+from collections import deque
+
+from logger import Logger
+
+DROP_NEWEST = 'drop_newest'
+DROP_OLDEST = 'drop_oldest'
+BLOCK = 'block'
+
+
+class _Marker(object):
+    """
+    Placed on the queue by flush/close, and signalled by the writer once every record ahead of it has been written.
+    Markers are never dropped by the backpressure policies.
+    """
+
+    def __init__(self, stop=False):
+        self.stop = stop
+        self.done = threading.Event()
+        self._callbacks = []
+
+    def add_done_callback(self, callback):
+        self._callbacks.append(callback)
+
+    def set(self):
+        self.done.set()
+        for callback in self._callbacks:
+            callback()
+
+
+class AsyncLogger(Logger):
+    """
+    A logger which never blocks the caller on I/O (unless the BLOCK policy is chosen): records are put on an
+    in-memory queue and written out to another logger (the sink) by a writer thread. Intended for use within an
+    asyncio event loop, where a blocking write to a stream or manager queue would stall every coroutine. E.g.
+
+        logger = AsyncLogger(StreamLogger(sys.stdout), name='svc')
+
+        async def main():
+            logger.log("Hello")
+            ...
+            await logger.aclose()
+
+    The records are fully constructed by this logger, and passed to the sink's _write_to_log, so the sink's level
+    and context are not applied.
+
+    When the queue holds max_size records the policy decides what to do with new records: DROP_NEWEST discards the
+    new record, DROP_OLDEST discards the oldest queued record (or the new one, while a flush/close is pending at the
+    head of the queue), and BLOCK waits for space (so should only be used outside the event loop thread). The number
+    of discarded records is available as the dropped property.
+
+    Loggers created with new() share the queue and writer.
+    """
+
+    def __init__(self, sink, level=None, max_size=10000, policy=DROP_NEWEST, **context):
+        super(AsyncLogger, self).__init__(level, **context)
+        if policy not in (DROP_NEWEST, DROP_OLDEST, BLOCK):
+            raise ValueError("Unknown backpressure policy '{}'".format(policy))
+        self._sink = sink
+        self._max_size = max_size
+        self._policy = policy
+        self._queue = deque()
+        self._wakeup = threading.Event()
+        self._not_full = threading.Condition()
+        self._stats = {'dropped': 0, 'errors': 0}
+        self._stats_lock = threading.Lock()
+        self._closed = False
+        self._stop_marker = None
+        self._marker_lock = threading.Lock()
+        self._writer = threading.Thread(target=self._drain, name='AsyncLogger-writer', daemon=True)
+        self._writer.start()
+
+    def clone(self):
+        return copy.copy(self)
+
+    @property
+    def dropped(self):
+        return self._stats['dropped']
+
+    @property
+    def errors(self):
+        return self._stats['errors']
+
+    def _count(self, stat):
+        # Counted from both the logging threads and the writer, so locked (only on the dropped/error paths)
+        with self._stats_lock:
+            self._stats[stat] += 1
+
+    def _write_to_log(self, details):
+        queue = self._queue
+        if self._closed:
+            self._count('dropped')
+            return
+        if len(queue) >= self._max_size:
+            if self._policy == DROP_NEWEST:
+                self._count('dropped')
+                return
+            elif self._policy == DROP_OLDEST:
+                if not self._drop_oldest():
+                    self._count('dropped')
+                    return
+            else:
+                with self._not_full:
+                    self._not_full.wait_for(lambda: len(queue) < self._max_size or self._closed)
+                if self._closed:
+                    # Woken by close, after the stop marker was queued, so the record would never be written
+                    self._count('dropped')
+                    return
+        queue.append(details)
+        if not self._wakeup.is_set():
+            self._wakeup.set()
+
+    def _drop_oldest(self):
+        """
+        Discard the oldest queued record, returning whether there was room made for another. Markers are never
+        discarded, and a record behind one can't safely be removed while the writer is popping from the queue, so if
+        a marker is at the head of the queue nothing is discarded, and the new record should be (as per DROP_NEWEST)
+        to keep the queue within max_size.
+        """
+        queue = self._queue
+        try:
+            if isinstance(queue[0], _Marker):
+                return False
+            oldest = queue.popleft()
+        except IndexError:
+            return True
+        if isinstance(oldest, _Marker):
+            # The writer popped the record first, so put the marker back, and make sure the writer sees it
+            queue.appendleft(oldest)
+            self._wakeup.set()
+            return False
+        self._count('dropped')
+        return True
+
+    def _drain(self):
+        queue, write = self._queue, self._sink._write_to_log
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            while queue:
+                item = queue.popleft()
+                if isinstance(item, _Marker):
+                    item.set()
+                    if item.stop:
+                        self._set_markers()
+                        return
+                    continue
+                try:
+                    write(item)
+                except Exception as e:
+                    self._count('errors')
+                    sys.stderr.write("AsyncLogger failed to write to sink: {}\n".format(e))
+                if self._policy == BLOCK:
+                    with self._not_full:
+                        self._not_full.notify()
+
+    def _set_markers(self):
+        # Anything left behind the stop marker was queued by a call racing the close: markers are set, so their
+        # waiters don't hang, and records are counted as dropped
+        with self._marker_lock:
+            while self._queue:
+                item = self._queue.popleft()
+                if isinstance(item, _Marker):
+                    item.set()
+                else:
+                    self._count('dropped')
+
+    def _put_marker(self, stop=False):
+        with self._marker_lock:
+            if self._stop_marker is not None:
+                # Once closed, everything logged has been written when the stop marker is reached
+                return self._stop_marker
+            marker = _Marker(stop)
+            if not self._writer.is_alive():
+                marker.set()
+                return marker
+            if stop:
+                self._stop_marker = marker
+            self._queue.append(marker)
+            self._wakeup.set()
+            return marker
+
+    async def _wait(self, marker):
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        marker.add_done_callback(lambda: loop.call_soon_threadsafe(_set_result, future))
+        if marker.done.is_set():
+            _set_result(future)
+        await future
+
+    async def flush(self):
+        """
+        Wait until every record logged before the call has been written to the sink.
+        """
+        await self._wait(self._put_marker())
+
+    async def aclose(self):
+        """
+        Write out any queued records then stop the writer. Subsequent records are dropped.
+        """
+        await self._wait(self._close())
+        self._sink.end_logging()
+
+    def end_logging(self):
+        """
+        A blocking equivalent of aclose, for use outside the event loop.
+        """
+        self._close().done.wait()
+        self._sink.end_logging()
+
+    def _close(self):
+        self._closed = True
+        with self._not_full:
+            self._not_full.notify_all()
+        return self._put_marker(stop=True)
+
+
+def _set_result(future):
+    if not future.done():
+        future.set_result(None)
@@ -1,4 +1,7 @@
+import threading
 import time
+from collections import namedtuple
+from concurrent.futures import Future
 
 
 def get_name(callable):
@@ -57,6 +60,121 @@ class Retry:
             raise exception
 
 
+# The result of one item of a BatchRetry call: its last outcome, whether that was a success and the attempts made
+ItemResult = namedtuple('ItemResult', ['item', 'outcome', 'ok', 'attempts'])
+
+
+class BatchRetry(Retry):
+    """
+    A Retry for bulk operations, where f takes a list of items and returns a list of per-item outcomes in the same
+    order, so that only the items which failed are retried (with backoff), rather than the whole batch. An item
+    fails if its outcome is an exception, or doesn't satisfy success. If f raises, every item of that call fails
+    with the exception as its outcome. If f returns the wrong number of outcomes, ValueError is raised.
+
+    Calling returns an ItemResult per item, in input order. Items which haven't succeeded after max_attempts are
+    returned with ok False, rather than raising, so that the successful items' results aren't lost.
+
+    With coalesce set (in seconds), calls to f from concurrent callers (e.g. threads retrying their failed items)
+    are coalesced: the first caller waits coalesce seconds for others, then makes a single call to f with all of
+    their items. Calls are split into batches of at most max_batch_size items. The number of calls made to f is
+    available as calls.
+    """
+
+    def __init__(self, f, success, max_attempts, retry_delay, backoff_factor=1, coalesce=None, max_batch_size=None):
+        super(BatchRetry, self).__init__(f, success, max_attempts, retry_delay, backoff_factor)
+        self._retry_delay = retry_delay
+        self._backoff_factor = backoff_factor
+        self._max_batch_size = max_batch_size
+        self._coalescer = _Coalescer(self._call_batches, coalesce) if coalesce is not None else None
+        self.calls = 0
+
+    def __call__(self, items):
+        items = list(items)
+        outcomes = [None] * len(items)
+        oks = [False] * len(items)
+        attempts = [0] * len(items)
+        pending = list(range(len(items)))
+        # Each call backs off independently of any others
+        backoff = self.Backoff(self._retry_delay, self._backoff_factor)
+        call = self._coalescer.submit if self._coalescer is not None else self._call_batches
+        ok = self._ok
+
+        while True:
+            print("Call {} attempt #{} with {} items".format(self.name, attempts[pending[0]] + 1 if pending else 1,
+                                                             len(pending)))
+            failed = []
+            for i, outcome in zip(pending, call([items[i] for i in pending])):
+                attempts[i] += 1
+                outcomes[i] = outcome
+                oks[i] = ok(outcome)
+                if not oks[i] and attempts[i] < self.max_attempts:
+                    failed.append(i)
+            if not failed:
+                break
+            pending = failed
+            backoff.wait()
+
+        return list(map(ItemResult, items, outcomes, oks, attempts))
+
+    def _ok(self, outcome):
+        return not isinstance(outcome, Exception) and self._success(outcome)
+
+    def _call_batches(self, items):
+        size = self._max_batch_size or len(items) or 1
+        outcomes = []
+        for start in range(0, len(items), size):
+            batch = items[start:start + size]
+            self.calls += 1
+            try:
+                batch_outcomes = list(self._f(batch))
+            except Exception as e:
+                batch_outcomes = [e] * len(batch)
+            # A bug in f rather than a failure of the items, so not retried
+            if len(batch_outcomes) != len(batch):
+                raise ValueError("{} returned {} outcomes for {} items".format(
+                    self.name, len(batch_outcomes), len(batch)))
+            outcomes.extend(batch_outcomes)
+        return outcomes
+
+
+class _Coalescer:
+    """
+    Combines the items submitted by concurrent callers into single calls of f. The first caller to submit becomes
+    the leader: it waits for window seconds for other callers' items, then calls f on behalf of all of them.
+    """
+
+    def __init__(self, f, window):
+        self._f = f
+        self._window = window
+        self._pending = []  # (item, future) pairs
+        self._leading = False
+        self._lock = threading.Lock()
+
+    def submit(self, items):
+        futures = [Future() for _ in items]
+        with self._lock:
+            self._pending.extend(zip(items, futures))
+            leader = not self._leading
+            self._leading = True
+
+        if leader:
+            time.sleep(self._window)
+            with self._lock:
+                batch, self._pending = self._pending, []
+                self._leading = False
+            try:
+                outcomes = self._f([item for item, _ in batch])
+            except BaseException as e:
+                # Don't leave the other callers waiting
+                for _, future in batch:
+                    future.set_exception(e)
+                raise
+            for (_, future), outcome in zip(batch, outcomes):
+                future.set_result(outcome)
+
+        return [future.result() for future in futures]
+
+
 class Callable:
 
     def __init__(self):
@@ -71,6 +189,42 @@ class Callable:
 
 
 if __name__ == '__main__':
+    import random
+    from concurrent.futures import ThreadPoolExecutor
+
+    class FlakyBulkWrite:
+        """
+        Writes a batch of items, failing each item on its first attempt with the given probability.
+        """
+        def __init__(self, failure_rate):
+            self.failure_rate = failure_rate
+            self.seen = set()
+            self.items_written = 0
+
+        def __call__(self, items):
+            outcomes = []
+            for item in items:
+                self.items_written += 1
+                if item not in self.seen and random.random() < self.failure_rate:
+                    outcomes.append(IOError("Failed to write {}".format(item)))
+                else:
+                    outcomes.append(True)
+                self.seen.add(item)
+            return outcomes
+
+    write = FlakyBulkWrite(failure_rate=0.003)
+    br = BatchRetry(write, success=bool, max_attempts=3, retry_delay=0.01)
+    results = br(range(10000))
+    print("{} of {} items written, {} items retried, {} writes in total".format(
+        sum(r.ok for r in results), len(results), sum(r.attempts > 1 for r in results), write.items_written))
+
+    for coalesce in (None, 0.05):
+        write = FlakyBulkWrite(failure_rate=0.1)
+        br = BatchRetry(write, success=bool, max_attempts=5, retry_delay=0.01, coalesce=coalesce)
+        with ThreadPoolExecutor(8) as pool:
+            batches = list(pool.map(br, [range(i * 100, (i + 1) * 100) for i in range(8)]))
+        assert [r.item for r in batches[3]] == list(range(300, 400))
+        print("coalesce={}: {} calls for 8 concurrent callers".format(coalesce, br.calls))
 
     r = Retry(Callable(), success=lambda x: x == 99, max_attempts=10, retry_delay=0.1, backoff_factor=1)
     val = r(8)
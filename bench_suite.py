@@ -0,0 +1,515 @@
+"""
+A benchmark suite covering the hot paths of the core modules, for tracking their performance over time. Each run
+appends its results (with the git revision, Python version and machine) as a line of JSON to a history file, and
+compare checks the latest run against an earlier one, flagging benchmarks which have slowed beyond a threshold.
+
+    python bench_suite.py run [name ...] [--repeat N] [--label LABEL]
+    python bench_suite.py compare [--baseline REF] [--threshold 0.1]
+    python bench_suite.py list
+
+Benchmark names are of the form <module>.<case>, and run accepts prefixes of them, e.g. 'demux' or 'logger.log'.
+Everything runs offline. Modules whose dependencies aren't installed (e.g. pystache for string_template) are skipped.
+"""
+import argparse
+import atexit
+import contextlib
+import datetime
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+HISTORY = 'bench_history.jsonl'
+
+
+def temp_dir():
+    # A scratch directory for benchmark files, removed on exit
+    path = tempfile.mkdtemp(prefix='bench_suite_')
+    atexit.register(shutil.rmtree, path, ignore_errors=True)
+    return path
+
+
+def call(f, *args, **kwargs):
+    return lambda: f(*args, **kwargs)
+
+
+class NullHandler(object):
+
+    def write(self, **kwargs):
+        pass
+
+
+class NullBatchHandler(NullHandler):
+
+    def write_batch(self, records):
+        pass
+
+
+def bench_logger():
+    """
+    Logger.log by depth of the logger hierarchy, and below the level
+    """
+    from logger import NullLogger
+
+    cases = []
+    for depth in (0, 1, 2, 4, 8):
+        logger = NullLogger(name='svc')
+        for i in range(depth):
+            logger = logger.new(name='child{}'.format(i))
+        cases.append(('log/depth={}'.format(depth), call(logger.log, "Hello", item=1), 1))
+    quiet = NullLogger(level='ERROR', name='svc')
+    cases.append(('log/below_level', call(quiet.log, "Hello", item=1), 1))
+    return cases
+
+
+def bench_log_tracing():
+    """
+    Entering and exiting a span by sample rate, and the cost of one sample of the stacks of four threads by the
+    SamplingProfiler (its overhead is this cost divided by its interval)
+    """
+    import log_tracing
+    from logger import NullLogger
+
+    logger = NullLogger(name='svc')
+
+    def top_level(rate):
+        def f():
+            with logger.span('request', sample_rate=rate):
+                pass
+        return f
+
+    def nested():
+        with logger.span('request', sample_rate=1):
+            for _ in range(10):
+                with log_tracing.span('query'):
+                    pass
+
+    cases = [('span/rate={}'.format(rate), top_level(rate), 1) for rate in (0, 0.01, 1)]
+    cases.append(('span/nested', nested, 11))
+    # The profiler doesn't sample its own thread, so give it some (parked) threads to sample
+    parked = threading.Event()
+    for _ in range(4):
+        threading.Thread(target=parked.wait, daemon=True).start()
+    profiler = log_tracing.SamplingProfiler(logger)
+    cases.append(('profiler/sample/threads=4', profiler.sample, 1))
+    return cases
+
+
+def bench_demux():
+    """
+    Demultiplexer.write by number of routes, with exact and regex patterns, and routing a batch of records (ns per
+    record) with a loop of write calls versus write_many, to handlers with and without write_batch
+    """
+    from demux import Demultiplexer
+
+    cases = []
+    for n_routes in (1, 10, 100):
+        d = Demultiplexer()
+        for i in range(n_routes):
+            d.add_route_handler(NullHandler(), tag='route-{}'.format(i))
+        cases.append(('write/routes={}'.format(n_routes), call(d.write, message='foo', tag='route-0'), 1))
+
+        d = Demultiplexer()
+        for i in range(n_routes):
+            d.add_route_handler(NullHandler(), tag=re.compile('^route-{}$'.format(i)))
+        cases.append(('write/regex_routes={}'.format(n_routes),
+                      call(d.write, message='foo', tag='route-0'), 1))
+
+    records = [{'message': 'foo', 'item': i, 'tag': 'route-{}'.format(i % 10)} for i in range(1000)]
+
+    def write_loop(d):
+        for record in records:
+            d.write(**record)
+
+    for n_routes in (10, 100):
+        for handler_name, handler_type in [('write', NullHandler), ('write_batch', NullBatchHandler)]:
+            d = Demultiplexer()
+            for i in range(n_routes):
+                d.add_route_handler(handler_type(), tag=re.compile('^route-{}$'.format(i)))
+            cases.append(('write_loop/{}/regex_routes={}'.format(handler_name, n_routes), call(write_loop, d),
+                          len(records)))
+            cases.append(('write_many/{}/regex_routes={}'.format(handler_name, n_routes),
+                          call(d.write_many, records), len(records)))
+    return cases
+
+
+def bench_memoize():
+    """
+    Memoized calls which hit and miss the cache, and the cost of building keys with each key strategy
+    """
+    from memoize import content_key, default_key, identity_key, memoize
+
+    def f(a, b=0):
+        return a
+
+    hit = memoize(f)
+    hit(1, b=2)
+
+    def misses():
+        g = memoize(f)
+        for i in range(1000):
+            g(i, b=i)
+
+    cases = [
+        ('hit', call(hit, 1, b=2), 1),
+        ('miss', misses, 1000),
+        ('undecorated', call(f, 1, b=2), 1),
+    ]
+
+    args = [
+        ('tuple=10000', tuple(range(10000))),
+        ('list=10000', list(range(10000))),
+        ('dict=1000', {str(i): i for i in range(1000)}),
+        ('bytes=1MB', bytes(2 ** 20)),
+    ]
+    try:
+        import numpy
+        args.append(('ndarray=1MB', numpy.zeros(2 ** 17)))
+    except ImportError:
+        pass
+
+    for key in (default_key, content_key, identity_key):
+        strategy = key.__name__[:-len('_key')]
+        for arg_name, arg in args:
+            try:
+                hash(key((arg,), {}))
+            except TypeError:
+                continue  # e.g. the default key of unhashable arguments
+            hit = memoize(f, key=key)
+            hit(arg)
+            cases.append(('key/{}/{}'.format(strategy, arg_name), call(key, (arg,), {}), 1))
+            cases.append(('hit/{}/{}'.format(strategy, arg_name), call(hit, arg), 1))
+    return cases
+
+
+def bench_backoff_retry():
+    """
+    Overhead of a Retry call which succeeds first time, and a bulk write of 10000 items of which 30 fail on the first
+    attempt, retrying the whole batch with Retry versus only the failed items with BatchRetry (ns per item)
+    """
+    from backoff_retry import BatchRetry, Retry
+
+    retry = Retry(lambda x: x, success=lambda x: True, max_attempts=3, retry_delay=0)
+
+    def calls():
+        for i in range(1000):
+            retry(i)
+
+    items = list(range(10000))
+    failing = set(range(0, 10000, 333))
+
+    def bulk_write():
+        # Each item takes a little work to write, and the failing items fail on their first attempt
+        seen = set()
+
+        def write(batch):
+            outcomes = []
+            for item in batch:
+                sum(range(200))
+                outcomes.append(item not in failing or item in seen)
+                seen.add(item)
+            return outcomes
+        return write
+
+    def whole_batch():
+        Retry(bulk_write(), success=all, max_attempts=3, retry_delay=0)(items)
+
+    def failed_items():
+        BatchRetry(bulk_write(), success=bool, max_attempts=3, retry_delay=0)(items)
+
+    # Retry prints each attempt, which is part of its cost, but shouldn't be subject to the terminal's speed
+    return [
+        ('call/first_attempt', quietly(calls), 1000),
+        ('batch/whole_batch_retry', quietly(whole_batch), len(items)),
+        ('batch/failed_items_retry', quietly(failed_items), len(items)),
+    ]
+
+
+def quietly(f):
+    def wrapper():
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            f()
+    return wrapper
+
+
+def bench_chunked_iteration():
+    """
+    Throughput of batch_iter and dynamic_batch_iter (ns per item)
+    """
+    from chunked_iteration import batch_iter, dynamic_batch_iter
+
+    data = list(range(100000))
+
+    def consume(batches):
+        for batch in batches:
+            for _ in batch:
+                pass
+
+    cases = []
+    for size in (10, 1000):
+        cases.append(('batch_iter/size={}'.format(size), lambda size=size: consume(batch_iter(data, size)), len(data)))
+    cases.append(('dynamic_batch_iter/size=10', lambda: consume(dynamic_batch_iter(data, lambda: 10)), len(data)))
+    return cases
+
+
+def bench_layeredayeaye():
+    """
+    LayeredAyeAye access by number of layers, and update, and the time to load a large (7MB) JSON file and read one
+    key, parsed in full versus as a lazy layer (indexed on the spot, or with a cached index)
+    """
+    from layeredayeaye import LayeredAyeAye
+    from lazy_layer import open_layer
+
+    def layers(n):
+        return [{'a': {'b': i, 'c': {'d': 'x'}}, 'e{}'.format(i): i} for i in range(n)]
+
+    cases = []
+    for n_layers in (1, 10):
+        config = LayeredAyeAye()
+        for layer in layers(n_layers):
+            config.update(layer)
+        cases.append(('getattr/layers={}'.format(n_layers), lambda config=config: config.a.c.d, 1))
+        cases.append(('getitem/layers={}'.format(n_layers), lambda config=config: config['e0'], 1))
+
+    def update():
+        # Each update invalidates the merged view, so is followed by an access to rebuild it
+        config = LayeredAyeAye({'a': {'b': 0}})
+        for layer in layers(10):
+            config.update(layer)
+            config.a
+    cases.append(('update', update, 10))
+
+    path = os.path.join(temp_dir(), 'config.json')
+    with open(path, 'w') as f:
+        json.dump({'section{}'.format(i): {'key{}'.format(j): {'value': 'x' * 20, 'n': j, 'items': [1, 2, 3]}
+                                           for j in range(50)} for i in range(2000)}, f)
+
+    def parsed():
+        with open(path) as f:
+            return LayeredAyeAye(json.load(f)).section7.key3.value
+
+    open_layer(path)
+    cases.extend([
+        ('load_one_key/parsed', parsed, 1),
+        ('load_one_key/lazy', lambda: LayeredAyeAye(open_layer(path, cache=False)).section7.key3.value, 1),
+        ('load_one_key/lazy_cached_index', lambda: LayeredAyeAye(open_layer(path)).section7.key3.value, 1),
+    ])
+    return cases
+
+
+def bench_string_template():
+    """
+    expand_config by config size
+    """
+    from string_template import expand_config
+
+    def config(n):
+        d = {'base_path': '/Data/base/', 'build_name': '123'}
+        for i in range(n):
+            d['path{}'.format(i)] = '{{base_path}}{{build_name}}/' + str(i)
+            d['section{}'.format(i)] = {'target_path': '{{{{path{}}}}}'.format(i), 'params': {'host': i}}
+        return d
+
+    return [('expand_config/keys={}'.format(n), call(expand_config, config(n)), 1) for n in (10, 100, 1000)]
+
+
+def bench_despatch_decorators():
+    """
+    Observable.notify by number of observers
+    """
+    from despatch_decorators import Observable, Observer
+
+    class Handler(Observer):
+
+        @Observer.on('foo')
+        def foo(self):
+            return True
+
+        @Observer.default
+        def other(self):
+            return True
+
+    cases = []
+    for n_observers in (1, 10, 100):
+        subject = Observable()
+        handlers = [Handler() for _ in range(n_observers)]
+        for handler in handlers:
+            subject.add_observer(handler)
+        # The observers are only weakly referenced, so are kept alive by the case
+        cases.append(('notify/observers={}'.format(n_observers),
+                      lambda subject=subject, handlers=handlers: subject.notify('foo'), 1))
+    return cases
+
+
+SUITES = OrderedDict((name[len('bench_'):], f) for name, f in list(globals().items()) if name.startswith('bench_'))
+
+
+def measure(f, ops, repeat, min_time=0.1):
+    """
+    Time f in batches of calls lasting at least min_time, as timeit's autorange does, returning the ns per
+    operation (f performing ops operations per call) of each of repeat batches.
+    """
+    loops = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            f()
+        elapsed = time.perf_counter() - t0
+        if elapsed >= min_time:
+            break
+        loops *= 10 if elapsed < min_time / 10 else 2
+
+    runs = [elapsed]
+    for _ in range(repeat - 1):
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            f()
+        runs.append(time.perf_counter() - t0)
+    return [t * 1e9 / (loops * ops) for t in runs]
+
+
+def revision():
+    try:
+        rev = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL)
+        dirty = subprocess.call(['git', 'diff', '--quiet', 'HEAD'], stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return rev.decode('ascii').strip() + ('-dirty' if dirty else '')
+
+
+def run(names=(), repeat=5, min_time=0.1, label=None, history=HISTORY):
+    results = OrderedDict()
+    for suite, setup in SUITES.items():
+        if names and not any(n == suite or n.startswith(suite + '.') or suite.startswith(n) for n in names):
+            continue
+        try:
+            cases = setup()
+        except ImportError as e:
+            print("{:<45} skipped ({})".format(suite, e))
+            continue
+        for case, f, ops in cases:
+            name = '{}.{}'.format(suite, case)
+            if names and not any(name.startswith(n) for n in names):
+                continue
+            runs = measure(f, ops, repeat, min_time)
+            results[name] = {'min': min(runs), 'median': statistics.median(runs), 'runs': runs}
+            print("{:<45} {:12.1f}ns/op (median {:.1f})".format(name, min(runs), statistics.median(runs)))
+
+    entry = OrderedDict([
+        ('time', datetime.datetime.now().isoformat()),
+        ('revision', revision()),
+        ('label', label),
+        ('python', platform.python_version()),
+        ('machine', platform.node()),
+        ('results', results),
+    ])
+    with open(history, 'a') as f:
+        f.write(json.dumps(entry) + '\n')
+    return entry
+
+
+def load_history(history=HISTORY):
+    with open(history) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def find_run(entries, ref):
+    """
+    Find a run by index into the history (e.g. -2 for the one before last), or by revision or label (the latest
+    such run).
+    """
+    if re.match(r'^-?\d+$', ref):
+        return entries[int(ref)]
+    for entry in reversed(entries):
+        if ref in (entry['revision'], entry['label']) or (entry['revision'] or '').startswith(ref):
+            return entry
+    raise ValueError("No run matching '{}' in the history".format(ref))
+
+
+def noise(result):
+    # The relative spread of a benchmark's runs, as an estimate of its measurement noise
+    return (result['median'] - result['min']) / result['min'] if result['min'] else 0
+
+
+def compare(baseline=None, latest='-1', threshold=0.1, history=HISTORY):
+    """
+    Compare the minimum ns/op of each benchmark of the latest run to the baseline run (by default, the most recent
+    earlier run on the same machine and Python version), flagging regressions: a benchmark is regressed if it is
+    slower by more than the threshold, or by more than its noise (the relative spread of its runs in either run) if
+    that is greater. Returns the names of the regressed benchmarks.
+    """
+    entries = load_history(history)
+    new = find_run(entries, latest)
+    if baseline is None:
+        earlier = [e for e in entries[:entries.index(new)]
+                   if (e['machine'], e['python']) == (new['machine'], new['python'])]
+        if not earlier:
+            raise ValueError("No earlier run on this machine and Python version to compare against")
+        old = earlier[-1]
+    else:
+        old = find_run(entries, baseline)
+
+    print("Comparing {} ({}) to {} ({})".format(new['revision'], new['time'], old['revision'], old['time']))
+    regressions = []
+    for name, result in new['results'].items():
+        if name not in old['results']:
+            print("{:<45} {:>12} {:12.1f}ns/op  new".format(name, '', result['min']))
+            continue
+        before = old['results'][name]
+        change = result['min'] / before['min'] - 1
+        allowed = max(threshold, noise(result), noise(before))
+        if change > allowed:
+            flag = 'REGRESSION'
+            regressions.append(name)
+        elif change < -allowed:
+            flag = 'improved'
+        else:
+            flag = ''
+        print("{:<45} {:12.1f} {:12.1f}ns/op {:+7.1%}  {}".format(name, before['min'], result['min'], change, flag))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--history', default=HISTORY, help="history file (default: %(default)s)")
+    commands = parser.add_subparsers(dest='command')
+
+    run_parser = commands.add_parser('run', help="run benchmarks and append the results to the history")
+    run_parser.add_argument('names', nargs='*', help="benchmark names or prefixes (default: all)")
+    run_parser.add_argument('--repeat', type=int, default=5)
+    run_parser.add_argument('--min-time', type=float, default=0.1, help="minimum seconds per timed batch")
+    run_parser.add_argument('--label')
+
+    compare_parser = commands.add_parser('compare', help="compare the latest run to an earlier one")
+    compare_parser.add_argument('--baseline', help="history index, revision or label of the run to compare to")
+    compare_parser.add_argument('--latest', default='-1', help="history index, revision or label of the new run")
+    compare_parser.add_argument('--threshold', type=float, default=0.1, help="relative slowdown allowed")
+
+    commands.add_parser('list', help="list the benchmark suites")
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        run(args.names, args.repeat, args.min_time, args.label, args.history)
+    elif args.command == 'compare':
+        regressions = compare(args.baseline, args.latest, args.threshold, args.history)
+        if regressions:
+            print("{} regression(s): {}".format(len(regressions), ', '.join(regressions)))
+            return 1
+    elif args.command == 'list':
+        for suite, setup in SUITES.items():
+            print("{:<25} {}".format(suite, ' '.join(setup.__doc__.split())))
+    else:
+        parser.print_help()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
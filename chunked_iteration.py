@@ -26,7 +26,11 @@ def batch_iter(iterable, size):
     source_iter = iter(iterable)
     while True:
         batchiter = itertools.islice(source_iter, size)
-        yield itertools.chain([next(batchiter)], batchiter)
+        try:
+            first = next(batchiter)
+        except StopIteration:
+            return
+        yield itertools.chain([first], batchiter)
 
 
 def dynamic_batch_iter(iterable, size_func):
@@ -39,7 +43,11 @@ def dynamic_batch_iter(iterable, size_func):
     source_iter = iter(iterable)
     while True:
         batchiter = itertools.islice(source_iter, size_func())
-        yield itertools.chain([next(batchiter)], batchiter)
+        try:
+            first = next(batchiter)
+        except StopIteration:
+            return
+        yield itertools.chain([first], batchiter)
 
 
 if __name__ == '__main__':
@@ -6,14 +6,52 @@ RegexType = type(re.compile(''))
 class Demultiplexer:
     def __init__(self):
         self._route_handlers = []
+        self._route_keys = ()
 
     def add_route_handler(self, handler, **route):
         self._route_handlers.append((handler, route))
+        self._route_keys = tuple(sorted(set(self._route_keys).union(route)))
 
     def write(self, **kwargs):
         for handler in self._match_route(**kwargs):
             handler.write(**kwargs)
 
+    def write_many(self, records):
+        """
+        Routes many records (dicts of the kwargs that would be passed to write) at once. Records are grouped by their
+        route signature, the values of the keys which any route matches on, so the routes are only evaluated once per
+        distinct signature. Each handler then receives all of its records, in order, as a list passed to its
+        write_batch method if it has one, or otherwise by a write call per record. Note that, unlike a loop of
+        write calls, one handler's records are all delivered before the next handler's.
+        """
+        keys = self._route_keys
+        matches = {}  # signature -> indices of the matching routes
+        batches = [[] for _ in self._route_handlers]
+
+        for record in records:
+            signature = tuple(record.get(key) for key in keys)
+            try:
+                matched = matches.get(signature)
+            except TypeError:
+                # Unhashable values can't be grouped, so are matched individually
+                matched, signature = None, None
+            if matched is None:
+                matched = [i for i, (_, route) in enumerate(self._route_handlers) if match_all(record, route)]
+                if signature is not None:
+                    matches[signature] = matched
+            for i in matched:
+                batches[i].append(record)
+
+        for (handler, _), batch in zip(self._route_handlers, batches):
+            if not batch:
+                continue
+            write_batch = getattr(handler, 'write_batch', None)
+            if write_batch is not None:
+                write_batch(batch)
+            else:
+                for record in batch:
+                    handler.write(**record)
+
     def _match_route(self, **kwargs):
         return (
             handler for handler, route in self._route_handlers
@@ -44,6 +82,11 @@ class Printer:
         print(self._name, kwargs)
 
 
+class BatchPrinter(Printer):
+    def write_batch(self, records):
+        print(self._name, len(records), "records", records)
+
+
 if __name__ == '__main__':
     d = Demultiplexer()
 
@@ -57,3 +100,10 @@ if __name__ == '__main__':
 
     d.write(message="foo", tag='route-left')
     d.write(message="bar", tag='route-right')
+
+    d.add_route_handler(BatchPrinter("batch-left"), tag='route-left')
+    d.write_many([
+        {'message': "foo", 'tag': 'route-left'},
+        {'message': "bar", 'tag': 'route-right'},
+        {'message': "baz", 'tag': 'route-left'},
+    ])
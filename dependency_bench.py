@@ -0,0 +1,111 @@
+"""
+Import-time benchmark for dependency_decorators. Generates a throwaway package containing a few hundred classes
+decorated with inputs/outputs, whose dependencies live in separate model modules, and times importing it in a fresh
+interpreter with the lazy decorators against an eager equivalent (which resolves every dependency at decoration).
+
+    python dependency_bench.py [n_classes] [n_models]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+EAGER_DECORATORS = '''
+from dependency_decorators import import_class
+
+
+class _Eager:
+    def __init__(self, attr, **kwargs):
+        self._attr = attr
+        self._dependencies = kwargs
+
+    def __call__(self, C):
+        setattr(C, self._attr, type('Resolved', (), {k: import_class(v) for k, v in self._dependencies.items()}))
+        return C
+
+
+def inputs(**kwargs):
+    return _Eager('input', **kwargs)
+
+
+def outputs(**kwargs):
+    return _Eager('output', **kwargs)
+'''
+
+TIMER = '''
+import sys, time
+sys.path[:0] = [{here!r}, {root!r}]
+t0 = time.perf_counter()
+import {package}.pipeline
+t1 = time.perf_counter()
+if {warm_up}:
+    import dependency_decorators
+    for class_path, future in dependency_decorators.warm_up(wait=True).items():
+        if class_path.startswith({package!r}):
+            future.result()
+t2 = time.perf_counter()
+print(t1 - t0, t2 - t1)
+'''
+
+
+def make_package(root, name, n_classes, n_models, eager):
+    path = os.path.join(root, name)
+    os.mkdir(path)
+    open(os.path.join(path, '__init__.py'), 'w').close()
+
+    for m in range(n_models):
+        with open(os.path.join(path, 'model_{}.py'.format(m)), 'w') as f:
+            # Give each model module a little import-time weight, as a real model module would have
+            f.write('import collections, decimal, fractions\n')
+            f.write('TABLE = {i: str(i) for i in range(2000)}\n')
+            f.write('class Model{0}:\n    pass\n'.format(m))
+
+    lines = []
+    if eager:
+        with open(os.path.join(path, 'eager.py'), 'w') as f:
+            f.write(EAGER_DECORATORS)
+        lines.append('from {}.eager import inputs, outputs\n'.format(name))
+    else:
+        lines.append('from dependency_decorators import inputs, outputs\n')
+
+    for c in range(n_classes):
+        a, b, o = c % n_models, (c * 7 + 1) % n_models, (c * 13 + 2) % n_models
+        lines.append(
+            "\n@inputs(A='{p}.model_{a}.Model{a}', B='{p}.model_{b}.Model{b}')\n"
+            "@outputs(O='{p}.model_{o}.Model{o}')\n"
+            "class Node{c}:\n"
+            "    def do_stuff(self):\n"
+            "        return self.input.A, self.input.B, self.output.O\n".format(p=name, a=a, b=b, o=o, c=c))
+
+    with open(os.path.join(path, 'pipeline.py'), 'w') as f:
+        f.writelines(lines)
+
+
+def time_import(root, package, warm_up=False, repeat=5):
+    script = TIMER.format(here=HERE, root=root, package=package, warm_up=warm_up)
+    timings = []
+    for _ in range(repeat):
+        out = subprocess.check_output([sys.executable, '-c', script], universal_newlines=True)
+        timings.append(tuple(float(t) for t in out.split()))
+    return min(timings)
+
+
+def main(n_classes=500, n_models=200):
+    with tempfile.TemporaryDirectory() as root:
+        make_package(root, 'eager_pkg', n_classes, n_models, eager=True)
+        make_package(root, 'lazy_pkg', n_classes, n_models, eager=False)
+
+        eager, _ = time_import(root, 'eager_pkg')
+        lazy, _ = time_import(root, 'lazy_pkg')
+        lazy_warm, warm = time_import(root, 'lazy_pkg', warm_up=True)
+
+    print("{} decorated classes over {} model modules".format(n_classes, n_models))
+    print("eager import:            {:8.2f}ms".format(eager * 1e3))
+    print("lazy import:             {:8.2f}ms ({:.1f}x faster)".format(lazy * 1e3, eager / lazy))
+    print("lazy import + warm_up:   {:8.2f}ms + {:.2f}ms".format(lazy_warm * 1e3, warm * 1e3))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:3]])
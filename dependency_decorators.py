@@ -1,10 +1,36 @@
 import importlib
+from concurrent.futures import ThreadPoolExecutor
+
+# Process-wide cache of dotted class path -> resolved class, shared by every PropDict
+_resolved = {}
+# Every dotted class path declared via inputs/outputs, for warm_up
+_declared = set()
+# Every class decorated with inputs/outputs, in order of decoration (dict used as an ordered set)
+_decorated = {}
 
 
 class PropDict:
+    """
+    Attribute-style access to a set of named dependencies, given as dotted class paths. Each path is only imported
+    on first access to its attribute, after which the class is cached on the instance.
+    """
 
     def __init__(self, **kwargs):
-        self.__dict__.update(**kwargs)
+        self.__dict__['_paths'] = kwargs
+
+    def __getattr__(self, name):
+        if name == '_paths':
+            raise AttributeError(name)
+        try:
+            class_path = self._paths[name]
+        except KeyError:
+            raise AttributeError("{} instance has no attribute '{}'".format(self.__class__.__name__, name))
+        klass = resolve(class_path)
+        self.__dict__[name] = klass
+        return klass
+
+    def __dir__(self):
+        return list(self._paths)
 
 
 def import_class(class_path):
@@ -14,16 +40,58 @@ def import_class(class_path):
     return klass
 
 
+def resolve(class_path):
+    """
+    Returns the class for the given dotted path, importing it on the first request only.
+    """
+    try:
+        return _resolved[class_path]
+    except KeyError:
+        pass
+    # importlib serialises concurrent imports of the same module, so at worst two threads resolve the same class
+    klass = _resolved[class_path] = import_class(class_path)
+    return klass
+
+
+def decorated_classes():
+    """
+    Returns every class decorated with inputs and/or outputs so far, in the order they were decorated.
+    """
+    return list(_decorated)
+
+
+def declared_paths(C, attr):
+    """
+    Returns the dotted class paths declared by C for attr ('input' or 'output'), without importing anything.
+    """
+    prop_dict = C.__dict__.get(attr)
+    return dict(prop_dict._paths) if prop_dict is not None else {}
+
+
+def warm_up(max_workers=None, wait=False):
+    """
+    Pre-imports every dependency declared so far in a thread pool, so that first access doesn't pay the import cost.
+    Import errors are not raised here, but are held by the returned futures (one per class path).
+
+    :param max_workers: the size of the thread pool, defaults as per ThreadPoolExecutor.
+    :param wait: if True, block until all imports have completed.
+    :return: a dict of class path -> Future
+    """
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures = {class_path: executor.submit(resolve, class_path) for class_path in sorted(_declared)}
+    executor.shutdown(wait=wait)
+    return futures
+
+
 class inputs:
 
     def __init__(self, **kwargs):
         self._input_dependencies = kwargs
 
     def __call__(self, C):
-
-        inputs_dict = {k: import_class(v) for k, v in self._input_dependencies.items()}
-        inputs = PropDict(**inputs_dict)
-        setattr(C, 'input', inputs)
+        _declared.update(self._input_dependencies.values())
+        _decorated[C] = None
+        setattr(C, 'input', PropDict(**self._input_dependencies))
         return C
 
 
@@ -32,44 +100,44 @@ class outputs:
         self._output_dependencies = kwargs
 
     def __call__(self, C):
-        outputs_dict = {k: import_class(v) for k, v in self._output_dependencies.items()}
-        outputs = PropDict(**outputs_dict)
-        setattr(C, 'output', outputs)
+        _declared.update(self._output_dependencies.values())
+        _decorated[C] = None
+        setattr(C, 'output', PropDict(**self._output_dependencies))
         return C
 
 
-@inputs(Foo='test_classes.Foo', Bar='test_classes.Bar')
-@outputs(Baz='test_classes.Baz')
-class C:
-
-    def do_stuff(self):
-        print("C")
-        print(C.input.Foo)
-        print(C.input.Bar)
-        print(C.output.Baz)
-
-        try:
-            print(C.output.Foo)
-        except AttributeError:
-            print("There isn't an output model named Foo!")
-
-
-@inputs(Foo='test_classes.Foo')
-@outputs(Bar='test_classes.Bar')
-class D:
-
-    def do_stuff(self):
-        print("C")
-        print(self.input.Foo)
-        print(self.output.Bar)
-
-        try:
-            print(self.output.Foo)
-        except AttributeError:
-            print("There isn't an output model named Foo!")
-
-
 if __name__ == '__main__':
+    # Defined here rather than at module level, as decorating registers the classes with decorated_classes
+    # (and so with any DependencyGraph built from them), and test_classes only exists for this demo
+    @inputs(Foo='test_classes.Foo', Bar='test_classes.Bar')
+    @outputs(Baz='test_classes.Baz')
+    class C:
+
+        def do_stuff(self):
+            print("C")
+            print(C.input.Foo)
+            print(C.input.Bar)
+            print(C.output.Baz)
+
+            try:
+                print(C.output.Foo)
+            except AttributeError:
+                print("There isn't an output model named Foo!")
+
+    @inputs(Foo='test_classes.Foo')
+    @outputs(Bar='test_classes.Bar')
+    class D:
+
+        def do_stuff(self):
+            print("C")
+            print(self.input.Foo)
+            print(self.output.Bar)
+
+            try:
+                print(self.output.Foo)
+            except AttributeError:
+                print("There isn't an output model named Foo!")
+
     c = C()
     c.do_stuff()
 
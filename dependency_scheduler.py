@@ -0,0 +1,156 @@
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from dependency_decorators import declared_paths, decorated_classes
+
+NodeTiming = namedtuple('NodeTiming', ['node', 'wave', 'queued', 'duration'])
+
+
+class CycleError(Exception):
+    def __init__(self, nodes):
+        self.nodes = nodes
+        names = ', '.join(sorted(node_name(n) for n in nodes))
+        super(CycleError, self).__init__("Dependency cycle between: {}".format(names))
+
+
+def node_name(C):
+    return "{}.{}".format(C.__module__, C.__qualname__)
+
+
+class DependencyGraph(object):
+    """
+    A DAG of classes decorated with dependency_decorators.inputs/outputs. There is an edge from class A to class B
+    where B declares as an input a model (dotted class path) which A declares as an output. A class which consumes
+    its own output is not considered to depend on itself.
+
+    Only the declared paths are inspected, so building the graph doesn't import any of the models.
+    """
+
+    def __init__(self, classes=None):
+        self.nodes = list(classes) if classes is not None else decorated_classes()
+
+        producers = {}
+        for C in self.nodes:
+            for path in declared_paths(C, 'output').values():
+                producers.setdefault(path, []).append(C)
+
+        self.upstream = {C: set() for C in self.nodes}
+        for C in self.nodes:
+            for path in declared_paths(C, 'input').values():
+                self.upstream[C].update(p for p in producers.get(path, ()) if p is not C)
+
+    def waves(self):
+        """
+        Groups the nodes into topological 'waves': every node in a wave depends only on nodes in earlier waves, so
+        the nodes within a wave may run concurrently. Raises CycleError if the graph contains a cycle.
+
+        :return: a list of lists of classes
+        """
+        pending = {C: set(upstream) for C, upstream in self.upstream.items()}
+        result = []
+        while pending:
+            wave = sorted((C for C, upstream in pending.items() if not upstream), key=node_name)
+            if not wave:
+                raise CycleError(list(pending))
+            for C in wave:
+                del pending[C]
+            for upstream in pending.values():
+                upstream.difference_update(wave)
+            result.append(wave)
+        return result
+
+
+def _run_node(C, entry_point, submitted):
+    # Module level, so it can be sent to a process pool. Returns the queueing delay alongside the run time.
+    started = time.time()
+    t0 = time.perf_counter()
+    result = getattr(C(), entry_point)()
+    return result, started - submitted, time.perf_counter() - t0
+
+
+class Scheduler(object):
+    """
+    Runs the entry point of each node in a DependencyGraph (instantiating the class with no arguments), one wave
+    at a time, with the nodes of each wave running concurrently on a thread pool, or process pool if processes=True.
+    Nodes run in a process pool must be importable by the worker processes, and their results picklable.
+
+    Per-node timings are kept in the timings list, as NodeTiming tuples of the node, its wave index, the time spent
+    waiting for a worker and the time spent running the entry point (both in seconds).
+    """
+
+    def __init__(self, graph=None, entry_point='do_stuff', max_workers=None, processes=False):
+        self.graph = graph or DependencyGraph()
+        self.entry_point = entry_point
+        self.max_workers = max_workers
+        self.processes = processes
+        self.timings = []
+
+    def run(self):
+        """
+        Run every node. If a node raises, the remainder of its wave is allowed to finish, then the exception is
+        re-raised without running later waves.
+
+        :return: a dict of class -> entry point result
+        """
+        waves = self.graph.waves()
+        executor_type = ProcessPoolExecutor if self.processes else ThreadPoolExecutor
+        results = {}
+        self.timings = []
+
+        with executor_type(max_workers=self.max_workers) as executor:
+            for i, wave in enumerate(waves):
+                futures = [(C, executor.submit(_run_node, C, self.entry_point, time.time())) for C in wave]
+                for C, future in futures:
+                    results[C], queued, duration = future.result()
+                    self.timings.append(NodeTiming(C, i, queued, duration))
+
+        return results
+
+    def report(self):
+        lines = ["{:<4} {:<50} {:>10} {:>10}".format('wave', 'node', 'queued ms', 'run ms')]
+        for t in self.timings:
+            lines.append("{:<4} {:<50} {:>10.2f} {:>10.2f}".format(
+                t.wave, node_name(t.node), t.queued * 1e3, t.duration * 1e3))
+        return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    from dependency_decorators import inputs, outputs
+
+    class Step(object):
+        def do_stuff(self):
+            time.sleep(0.1)
+            return self.__class__.__name__
+
+    @outputs(Raw='models.Raw')
+    class Load(Step):
+        pass
+
+    @outputs(Ref='models.Ref')
+    class LoadReference(Step):
+        pass
+
+    @inputs(Raw='models.Raw')
+    @outputs(Clean='models.Clean')
+    class Clean(Step):
+        pass
+
+    @inputs(Raw='models.Raw', Ref='models.Ref')
+    @outputs(Joined='models.Joined')
+    class Join(Step):
+        pass
+
+    @inputs(Clean='models.Clean', Joined='models.Joined')
+    @outputs(Report='models.Report')
+    class Report(Step):
+        pass
+
+    graph = DependencyGraph([Load, LoadReference, Clean, Join, Report])
+    print([[C.__name__ for C in wave] for wave in graph.waves()])
+
+    scheduler = Scheduler(graph)
+    t0 = time.perf_counter()
+    scheduler.run()
+    print("Ran {} nodes in {:.2f}s".format(len(graph.nodes), time.perf_counter() - t0))
+    print(scheduler.report())
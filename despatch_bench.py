@@ -0,0 +1,70 @@
+"""
+Soak benchmark for despatch_decorators. Repeatedly creates short-lived observers, attaches them to a long-lived
+Observable and dispatches events, reporting the dispatch cost and traced memory per round. With weakly referenced
+observers both figures should stay flat for the duration of the run.
+
+    python despatch_bench.py [duration_seconds]
+"""
+import gc
+import sys
+import time
+import tracemalloc
+
+from despatch_decorators import Observable, Observer
+
+
+class QuietObserver(Observer):
+
+    @Observer.on('tick')
+    def tick(self):
+        return True
+
+    @Observer.default
+    def ignore(self):
+        return True
+
+
+def soak(duration=60.0, observers_per_round=100, events_per_round=1000, report_every=5.0):
+    observable = Observable()
+    keep_alive = [QuietObserver() for _ in range(10)]
+    for obs in keep_alive:
+        observable.add_observer(obs)
+
+    tracemalloc.start()
+    start = last_report = time.perf_counter()
+    rounds = reported_rounds = 0
+    elapsed = 0.0
+
+    def report(now):
+        current, peak = tracemalloc.get_traced_memory()
+        print("t={:7.1f}s rounds={:6d} observers={:4d} dispatch={:8.2f}us/event mem={:8.1f}KiB peak={:8.1f}KiB"
+              .format(now - start, rounds, len(observable.observers), 1e6 * elapsed / events_per_round,
+                      current / 1024, peak / 1024))
+
+    while time.perf_counter() - start < duration:
+        transient = [QuietObserver() for _ in range(observers_per_round)]
+        for obs in transient:
+            observable.add_observer(obs)
+        del transient, obs
+        gc.collect()
+
+        t0 = time.perf_counter()
+        for i in range(events_per_round):
+            observable.notify('tick' if i % 2 else 'other')
+        elapsed = time.perf_counter() - t0
+        rounds += 1
+
+        now = time.perf_counter()
+        if now - last_report >= report_every:
+            report(now)
+            last_report, reported_rounds = now, rounds
+
+    # A final report of any rounds since the last, so that runs shorter than report_every report too
+    if rounds > reported_rounds:
+        report(time.perf_counter())
+
+    tracemalloc.stop()
+
+
+if __name__ == '__main__':
+    soak(float(sys.argv[1]) if len(sys.argv) > 1 else 60.0)
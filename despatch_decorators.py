@@ -1,16 +1,49 @@
-from functools import wraps
+import threading
+import weakref
 
 
 class Observable:
+    """
+    Holds weak references to its observers, so an observer which is no longer referenced elsewhere is garbage
+    collected as normal and silently drops out of the notification list.
+    """
 
     def __init__(self):
-        self._observers = []
+        self._observers = {}
+        self._lock = threading.RLock()
 
     def add_observer(self, observer):
-        self._observers.append(observer)
+        key = id(observer)
+        self_ref = weakref.ref(self)
+
+        def discard(ref):
+            observable = self_ref()
+            if observable is not None:
+                observable._discard(key, ref)
+
+        ref = weakref.ref(observer, discard)
+        with self._lock:
+            observers = dict(self._observers)
+            observers[key] = ref
+            self._observers = observers
+
+    def remove_observer(self, observer):
+        self._discard(id(observer))
+
+    def _discard(self, key, ref=None):
+        # Copy-on-write, so that notify can iterate a snapshot without holding the lock
+        with self._lock:
+            if key in self._observers and (ref is None or self._observers[key] is ref):
+                observers = dict(self._observers)
+                del observers[key]
+                self._observers = observers
+
+    @property
+    def observers(self):
+        return [obs for obs in (ref() for ref in self._observers.values()) if obs is not None]
 
     def notify(self, *args):
-        result = all([obs.notify(*args) for obs in self._observers])
+        result = all([obs.notify(*args) for obs in self.observers])
         if not result:
             raise RuntimeError("Failed event notification, args = {}".format(args))
         return result
@@ -23,50 +56,39 @@ class Thing(Observable):
 
 
 class Metaclass(type):
-
-    _handlers = {}
-
-    def __new__(typ, *args):
-        klass = super(Metaclass, typ).__new__(typ, *args)
-        if not klass.__name__ == 'Observer':
-            klass._handlers = {k: v for k, v in Metaclass._handlers.items()}
-            Metaclass._handlers = {}
+    """
+    Builds the handler table for each Observer class from the functions tagged by Observer.on/Observer.default in
+    the class namespace. Handlers of base classes are inherited, and may be overridden by the subclass. As the table
+    is built entirely from the class being created there is no shared state, so classes may be defined concurrently.
+    """
+
+    def __new__(typ, name, bases, namespace):
+        klass = super(Metaclass, typ).__new__(typ, name, bases, namespace)
+        handlers = {}
+        for base in reversed(klass.__mro__[1:]):
+            handlers.update(base.__dict__.get('_handlers', {}))
+        for attr in namespace.values():
+            for event in getattr(attr, '_despatch_events', ()):
+                handlers[event] = attr
+        klass._handlers = handlers
         return klass
 
-    # def __init__(cls):
-    #     super(Metaclass, cls).__init__(cls)
-
-    def foo(cls):
-        pass
-
 
 class Observer(metaclass=Metaclass):
 
-    # __metaclass__ = Metaclass
-
     @classmethod
     def on(cls, *args):
         def wrap(f):
-            Metaclass._handlers[args] = f
-
-            @wraps(f)
-            def wrapper(*args):
-                return f(*args)
-
-            return wrapper
+            f._despatch_events = getattr(f, '_despatch_events', ()) + (args,)
+            return f
         return wrap
 
     @classmethod
     def default(cls, f):
-        Metaclass._handlers['__default__'] = f
-        @wraps(f)
-        def wrapper(*args):
-            return f(*args)
-
-        return wrapper
+        return cls.on('__default__')(f)
 
     def notify(self, *args):
-        func = self._handlers.get(args) or self._handlers.get('__default__')
+        func = self._handlers.get(args) or self._handlers.get(('__default__',))
         if not func:
             raise NotImplementedError("No function match for {}".format(args))
         result = func(self)
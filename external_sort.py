@@ -0,0 +1,146 @@
+import mmap
+import os
+import pickle
+import shutil
+import struct
+import sys
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from mergelist import merge_sorted
+
+# Run files are a sequence of records, each a little-endian uint32 length followed by that many bytes of pickle
+RECORD_HEADER = struct.Struct('<I')
+
+
+def write_run(items, path):
+    with open(path, 'wb') as f:
+        for item in items:
+            data = pickle.dumps(item, pickle.HIGHEST_PROTOCOL)
+            f.write(RECORD_HEADER.pack(len(data)))
+            f.write(data)
+    return path
+
+
+def read_run(path):
+    """
+    Iterate the items in a run file, which is memory-mapped so that only the pages currently being read need
+    to be resident.
+    """
+    if os.path.getsize(path) == 0:
+        return
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        offset, end = 0, len(m)
+        while offset < end:
+            (size,) = RECORD_HEADER.unpack_from(m, offset)
+            offset += RECORD_HEADER.size
+            yield pickle.loads(m[offset:offset + size])
+            offset += size
+
+
+def _sort_run(items, key, reverse, path):
+    # Module level, so it can be sent to a process pool
+    items.sort(key=key, reverse=reverse)
+    return write_run(items, path)
+
+
+def _chunks(iterable, budget):
+    """
+    Split iterable into lists whose approximate (shallow) size is within budget bytes.
+    """
+    chunk, size = [], 0
+    for item in iterable:
+        chunk.append(item)
+        size += sys.getsizeof(item)
+        if size >= budget:
+            yield chunk
+            chunk, size = [], 0
+    if chunk:
+        yield chunk
+
+
+def external_sort(iterable, key=None, reverse=False, unique=False, memory_limit=64 * 2 ** 20, max_workers=None,
+                  processes=True, fan_in=256, tmp_dir=None):
+    """
+    Sort an iterable which may be too large to fit in memory, returning a generator over the sorted items. E.g.
+
+    >>> with open('big.txt') as f:
+    >>>     for line in external_sort(f, memory_limit=2 ** 30):
+    >>>         ...
+
+    The input is consumed in chunks, each of which is sorted in a worker and spilled to a temporary 'run' file. The
+    runs are then lazily merged with mergelist.merge_sorted, reading each run through a memory map. Where there are
+    more than fan_in runs, groups of runs are first merged into larger runs, to bound the number of open files.
+    Temporary files are removed once the generator is exhausted or closed.
+
+    :param iterable: the items to sort, which must be picklable.
+    :param key: optional function of one argument used to extract the comparison key from each item. Must be
+        picklable (i.e. a module level function, not a lambda) when processes is set.
+    :param reverse: sort in descending order.
+    :param unique: drop items with an equal key to their predecessor in the output.
+    :param memory_limit: approximate budget in bytes for the items held in memory at once, across all workers.
+        Sizes are estimated with sys.getsizeof, so don't account for the contents of containers.
+    :param max_workers: the number of concurrent run sorts, defaults to the number of CPUs.
+    :param processes: sort runs on a process pool if set, otherwise on a thread pool.
+    :param fan_in: the maximum number of runs merged at once.
+    :param tmp_dir: where to create the temporary directory for run files, defaults as per tempfile.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    # One chunk being filled here, plus one per worker
+    budget = max(1, memory_limit // (max_workers + 1))
+    executor_type = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    run_dir = tempfile.mkdtemp(prefix='external_sort_', dir=tmp_dir)
+
+    def run_path(i):
+        return os.path.join(run_dir, 'run_{}.bin'.format(i))
+
+    try:
+        runs = []
+        in_flight = deque()
+        with executor_type(max_workers=max_workers) as executor:
+            for chunk in _chunks(iterable, budget):
+                if len(in_flight) >= max_workers:
+                    runs.append(in_flight.popleft().result())
+                path = run_path(len(runs) + len(in_flight))
+                in_flight.append(executor.submit(_sort_run, chunk, key, reverse, path))
+                del chunk
+            runs.extend(f.result() for f in in_flight)
+
+        next_run = len(runs)
+        while len(runs) > fan_in:
+            merged = []
+            for i in range(0, len(runs), fan_in):
+                group = runs[i:i + fan_in]
+                merged.append(write_run(merge_sorted(*map(read_run, group), key=key, reverse=reverse),
+                                        run_path(next_run)))
+                next_run += 1
+                for path in group:
+                    os.remove(path)
+            runs = merged
+
+        for item in merge_sorted(*map(read_run, runs), key=key, reverse=reverse, unique=unique):
+            yield item
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    import random
+    import time
+
+    data = [random.randint(0, 10 ** 9) for _ in range(10 ** 6)]
+
+    t0 = time.perf_counter()
+    result = list(external_sort(data, memory_limit=4 * 2 ** 20))
+    t1 = time.perf_counter()
+    expected = sorted(data)
+    t2 = time.perf_counter()
+
+    assert result == expected
+    print("Sorted {} items with a 4MiB budget in {:.2f}s (in-memory sorted(): {:.2f}s)".format(
+        len(data), t1 - t0, t2 - t1))
+
+    result = list(external_sort(data, reverse=True, unique=True, memory_limit=2 ** 20, fan_in=4))
+    assert result == sorted(set(data), reverse=True)
+    print("Reverse unique sort with multi-pass merge OK")
@@ -1,4 +1,6 @@
-from collections import defaultdict
+from collections.abc import Mapping
+
+from lazy_layer import LazyLayer
 
 
 class LayeredAyeAye(object):
@@ -22,15 +24,20 @@ class LayeredAyeAye(object):
 
         layer_1 = {'a': {'b': 1}}
         layer_2 = {'a': {'c': 2}}  # also ok
+
+    Layers may be LazyLayers (see lazy_layer.open_layer), which only load the values that are accessed. Merging is
+    done per key, on access, and validation of an update uses the types recorded in a lazy layer's index, so
+    neither loads the rest of a lazy layer. Only flattened (and so as_dict, keys, values and items) merges every key.
     """
 
     @classmethod
     def normalise_value(cls, v):
-        return cls(v) if isinstance(v, (cls, dict)) else v
+        return cls(v) if isinstance(v, (cls, dict, LazyLayer, _MergedView)) else v
 
     def __init__(self, data=None):
         self._layers = []
         self._flat = None
+        self._merged = {}
         if data:
             self.update(data)
 
@@ -42,37 +49,57 @@ class LayeredAyeAye(object):
         return self.__unicode__().encode("ascii", "replace")
 
     def keys(self):
-        return (k for k in self.flattened.iterkeys())
+        return (k for k in self.flattened.keys())
 
     def values(self):
-        return (self.normalise_value(v) for v in self.flattened.itervalues())
+        return (self.normalise_value(v) for v in self.flattened.values())
 
     def items(self):
         return ((k, self.normalise_value(v)) for k, v in self.flattened.items())
 
     @property
     def flattened(self):
-        def flatten():
-            result = defaultdict(dict)
-            for layer in self._layers:
-                for k, v in layer.items():
-                    if isinstance(v, (dict, set)):
-                        result[k].update(v.items())
-                    # Could choose to extend dictionary types here, but the requirement is unclear
-                    else:
-                        result[k] = v
-
-            return dict(result)
-
         if not self._flat:
-            self._flat = flatten()
+            keys = dict.fromkeys(k for layer in self._layers for k in layer)
+            self._flat = {k: self._merge(k) for k in keys}
         return self._flat
 
+    def _merge(self, key):
+        """
+        The value of key merged across the layers, as per flattened, without merging (or loading) any other keys.
+        """
+        try:
+            return self._merged[key]
+        except KeyError:
+            pass
+
+        # Walk down from the top layer, as a non-dict value overrides everything below it, which then needn't be
+        # merged (or loaded)
+        dicts = []
+        for layer in reversed(self._layers):
+            if key not in layer:
+                continue
+            # Could choose to extend dictionary types here, but the requirement is unclear
+            if type_of(layer, key) in (dict, set):
+                dicts.append(layer[key])
+            elif dicts:
+                break
+            else:
+                result = self._merged[key] = layer[key]
+                return result
+        if not dicts:
+            raise KeyError(key)
+
+        # A dict from a single layer is used as is, and dicts from several are merged in a view, rather than by
+        # copying their items, which would load every value of a lazy layer
+        result = self._merged[key] = dicts[0] if len(dicts) == 1 else _MergedView(dicts[::-1])
+        return result
+
     def __contains__(self, key):
         return any([key in layer for layer in self._layers])
 
     def as_dict(self):
-        return self.flattened
+        return {k: _plain(v) for k, v in self.flattened.items()}
 
     def layer(self, i):
         return self.__class__(self._layers[i])
@@ -84,7 +111,7 @@ class LayeredAyeAye(object):
             raise AttributeError("{} instance has no attribute '{}'".format(self.__class__.__name__, attr))
 
     def __getitem__(self, key):
-        item = self.flattened[key]
+        item = self._merge(key)
 
         if isinstance(item, list):
             return [self.normalise_value(s) if isinstance(s, (list, dict)) else s for s in item]
@@ -94,20 +121,72 @@ class LayeredAyeAye(object):
     def update(self, new_layer):
         def validate(layer, baseline):
             # For each key in the new layer, check the value is type-consistent with previous layers. Recursively.
-            for k, v in layer.items():
-                if k in baseline.flattened:
-                    types = (type(baseline.flattened[k]), type(v))
+            # The baseline is the previous layers' values at the same level, so that they needn't be merged (or
+            # loaded, if lazy) to be validated against.
+            for k in layer.keys():
+                below = [b for b in baseline if k in b]
+                if below:
+                    types = (type_of(below[-1], k), type_of(layer, k))
                     # TODO: review this type compatibility check. We mainly just want to check dict vs non-dict
                     if dict in types and types[0] != types[1]:
                         raise ValueError("Value of '{}' in new layer is inconsistent type".format(k))
-                    if isinstance(v, (self.__class__, dict)):
-                        validate(v, baseline[k])
+                    if types[1] in (self.__class__, dict):
+                        validate(layer[k], [b[k] for b in below if type_of(b, k) in (self.__class__, dict)])
             return layer
-        self._layers.append(validate(new_layer, self))
+        self._layers.append(validate(new_layer, self._layers))
         self._flat = None
+        self._merged = {}
 
     def __getstate__(self):
         return self.__dict__
 
     def __setstate__(self, state):
-        self.__dict__ = state
\ No newline at end of file
+        self.__dict__ = state
+
+
+class _MergedView(Mapping):
+    """
+    A read-only view of dicts merged one level deep, later dicts taking precedence, as if by dict.update. Keys are
+    looked up on access, so only the values read are loaded from lazy layers.
+    """
+
+    def __init__(self, maps):
+        self._maps = maps
+
+    def __getitem__(self, key):
+        for m in reversed(self._maps):
+            if key in m:
+                return m[key]
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(dict.fromkeys(k for m in self._maps for k in m))
+
+    def __len__(self):
+        return len(dict.fromkeys(k for m in self._maps for k in m))
+
+    def __contains__(self, key):
+        return any(key in m for m in self._maps)
+
+    def type_of(self, key):
+        for m in reversed(self._maps):
+            if key in m:
+                return type_of(m, key)
+        raise KeyError(key)
+
+
+def _plain(value):
+    if isinstance(value, Mapping):
+        return {k: _plain(v) for k, v in value.items()}
+    return value
+
+
+def type_of(layer, key):
+    """
+    The type of a layer's value for key, which for a LazyLayer (or a merged view of them) is found without loading
+    the value. Lazily loaded objects and merged views are reported as dicts.
+    """
+    if isinstance(layer, (LazyLayer, _MergedView)):
+        return layer.type_of(key)
+    t = type(layer[key])
+    return dict if t in (LazyLayer, _MergedView) else t
@@ -0,0 +1,246 @@
+"""
+Lazily loaded layers for LayeredAyeAye, for large JSON (or YAML) configuration files of which only a few keys are
+read. E.g.
+
+    config = LayeredAyeAye(open_layer('defaults.json'))
+    config.update(open_layer('site.yaml'))
+    config.db.host  # parses only the value of db.host
+
+The file is memory-mapped, and an index of the byte offsets of the values of the top level keys (or of the keys of
+objects to a given depth) is built, so that any value may be parsed on its own, on first access. Objects below the
+indexed depth are indexed in turn when first accessed. The index is cached next to the file as <file>.index, and
+reused until the file changes, so later process starts don't scan the file at all.
+
+YAML can't be parsed piecewise, so a YAML file is parsed in full once (which requires PyYAML), and cached as JSON
+(<file>.json-cache), which is then loaded lazily as above. Values with no JSON equivalent (e.g. dates) are cached as
+strings.
+"""
+import json
+import mmap
+import os
+import re
+from collections.abc import Mapping
+from json.decoder import scanstring
+
+# Bumped whenever the format of the index changes, so old index files are rebuilt
+INDEX_VERSION = 2
+
+_decoder = json.JSONDecoder()
+_skip_whitespace = re.compile(r'[ \t\n\r]*').match
+
+_TYPES = {ord('{'): dict, ord('['): list, ord('"'): str, ord('t'): bool, ord('f'): bool, ord('n'): type(None)}
+_WHITESPACE = b' \t\r\n'
+
+
+class _ByteOffsets(object):
+    """
+    Converts increasing character offsets into a decoded document into byte offsets into its UTF-8 encoding.
+    """
+
+    def __init__(self, text):
+        self._text = text
+        self._ascii = text.isascii()
+        self._char = 0
+        self._byte = 0
+
+    def __call__(self, pos):
+        if self._ascii:
+            return pos
+        self._byte += len(self._text[self._char:pos].encode('utf-8', 'surrogatepass'))
+        self._char = pos
+        return self._byte
+
+
+def build_index(data, depth=1):
+    """
+    Index a JSON document (bytes) whose top level is an object, returning {key: (start, end, child index)} for its
+    keys, where [start, end) is the byte range of the key's value in data, and the child index is the index of the
+    value if it's an object within depth levels of the top, or None. Values are skipped over with json's (C)
+    scanner, so building the index costs little more than parsing the document.
+    """
+    text = data.decode('utf-8', 'surrogatepass') if not isinstance(data, str) else data
+    pos = _skip_whitespace(text, 0).end()
+    if text[pos:pos + 1] != '{':
+        raise ValueError("The top level of a layer must be an object")
+    index, _ = _index_object(text, pos, depth, _ByteOffsets(text))
+    return index
+
+
+def _index_object(text, pos, depth, offsets):
+    # Index the object starting at pos, returning its index and the position following it
+    index = {}
+    pos = _skip_whitespace(text, pos + 1).end()
+    if text[pos:pos + 1] == '}':
+        return index, pos + 1
+    while True:
+        if text[pos:pos + 1] != '"':
+            raise ValueError("Expecting property name enclosed in double quotes at {}".format(pos))
+        key, pos = scanstring(text, pos + 1)
+        pos = _skip_whitespace(text, pos).end()
+        if text[pos:pos + 1] != ':':
+            raise ValueError("Expecting ':' delimiter at {}".format(pos))
+        pos = _skip_whitespace(text, pos + 1).end()
+
+        start = offsets(pos)
+        if depth > 1 and text[pos:pos + 1] == '{':
+            child, pos = _index_object(text, pos, depth - 1, offsets)
+        else:
+            child = None
+            _, pos = _decoder.raw_decode(text, pos)
+        index[key] = (start, offsets(pos), child)
+
+        pos = _skip_whitespace(text, pos).end()
+        delimiter = text[pos:pos + 1]
+        pos = _skip_whitespace(text, pos + 1).end()
+        if delimiter == '}':
+            return index, pos
+        if delimiter != ',':
+            raise ValueError("Expecting ',' delimiter at {}".format(pos))
+
+
+class LazyLayer(Mapping):
+    """
+    A read-only mapping over an object of an indexed JSON document, whose values are parsed on first access (and
+    then kept). Object values are returned as LazyLayers themselves, indexed on first access if they're below the
+    depth of the document's index, so nothing below them is parsed until it's accessed.
+    """
+
+    def __init__(self, data, index, path=None, keys=(), depth=1):
+        self._data = data
+        self._index = index
+        self._loaded = {}
+        self._depth = depth
+        self.path = path
+        self.keys_path = keys
+
+    def __getitem__(self, key):
+        try:
+            return self._loaded[key]
+        except KeyError:
+            pass
+        start, end, child = self._index[key]
+        keys = self.keys_path + (key,)
+        if child is not None:
+            value = LazyLayer(self._data, child, self.path, keys, self._depth)
+        elif self.type_of(key) is dict:
+            data = self._data[start:end]
+            value = LazyLayer(data, build_index(data, self._depth), self.path, keys, self._depth)
+        else:
+            value = json.loads(self._data[start:end])
+        self._loaded[key] = value
+        return value
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def type_of(self, key):
+        """
+        The type of the value of key (dict for objects), determined without loading it.
+        """
+        start, end, child = self._index[key]
+        if child is not None:
+            return dict
+        data = self._data
+        while data[start] in _WHITESPACE:
+            start += 1
+        t = _TYPES.get(data[start])
+        if t is None:
+            number = data[start:end]
+            t = float if b'.' in number or b'e' in number or b'E' in number else int
+        return t
+
+    def as_dict(self):
+        return {key: value.as_dict() if isinstance(value, LazyLayer) else value for key, value in self.items()}
+
+    def __repr__(self):
+        return '<LazyLayer {}{}>'.format(self.path, ''.join('[{!r}]'.format(k) for k in self.keys_path))
+
+    def __reduce__(self):
+        # Reopened (using the cached index) rather than pickling the file's contents
+        return _reopen, (self.path, self.keys_path, self._depth)
+
+
+def _reopen(path, keys, depth):
+    layer = open_layer(path, depth=depth)
+    for key in keys:
+        layer = layer[key]
+    return layer
+
+
+def open_layer(path, depth=1, cache=True):
+    """
+    Open a JSON or YAML (.yaml/.yml) file as a LazyLayer, indexing the objects within depth levels of the top. With
+    cache, the index (and for YAML, the JSON conversion) is read from, or written to, files next to the source file.
+    Failure to write them isn't an error.
+    """
+    index = _load_index(path, depth) if cache else None
+
+    if path.endswith(('.yaml', '.yml')):
+        data_path = path + '.json-cache'
+        if index is None or not os.path.exists(data_path):
+            data = _yaml_as_json(path)
+            index = build_index(data, depth)
+            if cache and _write_cache(data_path, data):
+                _save_index(path, depth, index)
+            return LazyLayer(data, index, path, depth=depth)
+    else:
+        data_path = path
+
+    with open(data_path, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if index is None:
+        index = build_index(data[:], depth)
+        if cache:
+            _save_index(path, depth, index)
+    return LazyLayer(data, index, path, depth=depth)
+
+
+def _signature(path, depth):
+    st = os.stat(path)
+    return INDEX_VERSION, depth, st.st_size, st.st_mtime_ns
+
+
+def _load_index(path, depth):
+    # The index is stored as JSON rather than pickled, so that whoever can write next to a file can't run code in
+    # the process loading it. JSON turns the (start, end, child) tuples into lists, which unpack the same.
+    try:
+        with open(path + '.index', 'rb') as f:
+            signature, index = json.load(f)
+    except (OSError, ValueError, TypeError):
+        return None
+    return index if tuple(signature) == _signature(path, depth) else None
+
+
+def _save_index(path, depth, index):
+    return _write_cache(path + '.index', json.dumps([_signature(path, depth), index]).encode('utf-8'))
+
+
+def _write_cache(cache_path, data):
+    # Written to a temporary file then renamed, so that concurrent readers never see a partial file
+    tmp_path = '{}.{}.tmp'.format(cache_path, os.getpid())
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, cache_path)
+        return True
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return False
+
+
+def _yaml_as_json(path):
+    import yaml
+    with open(path, 'rb') as f:
+        document = yaml.safe_load(f)
+    if not isinstance(document, dict):
+        raise ValueError("The top level of a layer must be a mapping")
+    return json.dumps(document, default=str).encode('utf-8')
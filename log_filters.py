@@ -0,0 +1,170 @@
+"""
+Filters for reducing log volume, which may be attached to any Logger with Logger.add_filter. Filters are called as
+f(logger, msg, level, context) before a log record is constructed, and return False to drop the record, so suppressed
+records cost little more than the filter itself. Filters may add items to context, which are included in the record.
+
+Records are keyed by the logger's flattened name plus the (unformatted) message, so log calls should pass variable
+data as context rather than formatting it into the message, e.g. logger.log("Connection failed", host=host).
+"""
+import random
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+
+def record_key(logger, msg):
+    return logger.name, msg
+
+
+class RateLimitFilter(object):
+    """
+    A token bucket rate limiter per record key. Each key may log up to burst records at once, refilling at rate
+    records per second. The number of records dropped is added as 'suppressed' to the context of the next record
+    allowed through for that key.
+
+    At most max_keys buckets are kept, the least recently used being discarded beyond that.
+    """
+
+    def __init__(self, rate, burst=None, max_keys=10000, clock=time.monotonic):
+        self._rate = rate
+        self._burst = burst or max(1, rate)
+        self._max_keys = max_keys
+        self._clock = clock
+        self._buckets = OrderedDict()  # key -> [tokens, last refill time, suppressed count]
+        self._lock = threading.Lock()
+
+    def __call__(self, logger, msg, level, context):
+        key = record_key(logger, msg)
+        now = self._clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self._burst, now, 0]
+                if len(self._buckets) > self._max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self._burst, bucket[0] + (now - bucket[1]) * self._rate)
+                bucket[1] = now
+
+            if bucket[0] < 1:
+                bucket[2] += 1
+                return False
+            bucket[0] -= 1
+            suppressed, bucket[2] = bucket[2], 0
+
+        if suppressed:
+            context['suppressed'] = suppressed
+        return True
+
+
+class SampleFilter(object):
+    """
+    Randomly passes the given fraction (0-1) of records.
+    """
+
+    def __init__(self, rate, random=random.random):
+        self._rate = rate
+        self._random = random
+
+    def __call__(self, logger, msg, level, context):
+        return self._random() < self._rate
+
+
+class HashSampleFilter(object):
+    """
+    Deterministically passes the given fraction (0-1) of record keys: every record with a given key is either
+    always passed or always dropped, consistently across processes and runs. The key may be overridden with a
+    function of (logger, msg, context), e.g. to sample by a request id so that each request is logged in full or
+    not at all.
+    """
+
+    def __init__(self, rate, key=None):
+        self._threshold = int(rate * 2 ** 32)
+        self._key = key
+        self._cache = {}
+
+    def __call__(self, logger, msg, level, context):
+        key = self._key(logger, msg, context) if self._key else record_key(logger, msg)
+        keep = self._cache.get(key)
+        if keep is None:
+            keep = zlib.crc32(repr(key).encode('utf-8')) < self._threshold
+            if len(self._cache) < 10000:
+                self._cache[key] = keep
+        return keep
+
+
+class DuplicateFilter(object):
+    """
+    Drops repeats of a record key within window seconds of the first occurrence. Once the window has passed, the
+    next occurrence is logged, preceded by a summary record of the form "<msg> (repeated N times)". Any outstanding
+    summaries may be written out with flush(), e.g. before end_logging.
+    """
+
+    def __init__(self, window=60.0, clock=time.monotonic):
+        self._window = window
+        self._clock = clock
+        self._seen = {}  # key -> [window start time, repeat count, logger, level]
+        self._lock = threading.Lock()
+
+    def __call__(self, logger, msg, level, context):
+        key = record_key(logger, msg)
+        now = self._clock()
+        with self._lock:
+            seen = self._seen.get(key)
+            if seen is not None and now - seen[0] < self._window:
+                seen[1] += 1
+                seen[2], seen[3] = logger, level
+                return False
+            self._seen[key] = [now, 0, logger, level]
+            self._expire(now)
+
+        if seen is not None and seen[1]:
+            self._summarise(msg, seen)
+        return True
+
+    def _expire(self, now):
+        # Forget keys whose window has passed with no repeats, so the table doesn't grow without bound
+        if len(self._seen) > 1000:
+            self._seen = {k: v for k, v in self._seen.items() if v[1] or now - v[0] < self._window}
+
+    def _summarise(self, msg, seen):
+        _, count, logger, level = seen
+        logger._emit("{} (repeated {} times)".format(msg, count), level, {'repeated': count})
+
+    def flush(self):
+        with self._lock:
+            pending = [(key[1], seen) for key, seen in self._seen.items() if seen[1]]
+            self._seen = {}
+        for msg, seen in pending:
+            self._summarise(msg, seen)
+
+
+if __name__ == '__main__':
+    import sys
+    import timeit
+
+    from logger import NullLogger, StreamLogger
+
+    logger = StreamLogger(sys.stdout, name='svc').new(name='db')
+    logger.add_filter(RateLimitFilter(rate=1, burst=2))
+    for i in range(5):
+        logger.log("Connection failed", attempt=i)
+    time.sleep(1.1)
+    logger.log("Connection failed", attempt=5)
+
+    dedupe = DuplicateFilter(window=0.5)
+    logger = StreamLogger(sys.stdout, name='svc').add_filter(dedupe)
+    for i in range(4):
+        logger.log("Disk full")
+    time.sleep(0.6)
+    logger.log("Disk full")
+    logger.log("Disk full")
+    dedupe.flush()
+
+    emitted = NullLogger(name='svc')
+    suppressed = NullLogger(name='svc').add_filter(HashSampleFilter(0.0))
+    n = 100000
+    print("emitted: {:.2f}us/record".format(timeit.timeit(lambda: emitted.log("Hello"), number=n) / n * 1e6))
+    print("suppressed: {:.2f}us/record".format(timeit.timeit(lambda: suppressed.log("Hello"), number=n) / n * 1e6))
@@ -0,0 +1,169 @@
+"""
+Dynamic, per-subtree level control for logger. A level registry maps flattened logger names (e.g. 'svc.db') to
+levels, matched hierarchically, so that setting DEBUG on 'svc.db' applies to 'svc.db' and 'svc.db.pool' but not to
+'svc.dbx'. While a registry is installed, a logger whose name falls under a registered prefix uses the registered
+level (the longest matching prefix winning) in place of its own. E.g.
+
+    log_levels.install(SharedLevelRegistry())
+    ...
+    log_levels.set_level('svc.db', 'DEBUG')  # takes effect in every logger under svc.db, in every process
+
+Each logger caches its resolved level along with the registry and its generation number, which is bumped on every
+change, so the check on each log call is a comparison of generation numbers rather than a lookup.
+"""
+import json
+import threading
+from multiprocessing import Lock, RawArray, RawValue
+
+# The installed registry of this process, or None
+active = None
+
+
+def level_value(level):
+    if isinstance(level, int):
+        return level
+    if isinstance(level, str):
+        from logger import Level
+        return Level[level].value
+    return level.value
+
+
+def prefixes(name):
+    """
+    The registry keys which may match name, longest first: 'a.b.c', 'a.b', 'a', then '' (the root).
+    """
+    parts = name.split('.') if name else []
+    for i in range(len(parts), 0, -1):
+        yield '.'.join(parts[:i])
+    yield ''
+
+
+class LevelRegistry(object):
+    """
+    A registry for use within a single process.
+    """
+
+    def __init__(self):
+        self._levels = {}
+        self._lookups = {}
+        self._lock = threading.Lock()
+        self.generation = 0
+
+    def set_level(self, prefix, level):
+        with self._lock:
+            levels = dict(self.levels())
+            levels[prefix] = level_value(level)
+            self._store(levels)
+
+    def clear(self, prefix=None):
+        """
+        Remove the level registered for prefix, or every level if prefix is None.
+        """
+        with self._lock:
+            levels = dict(self.levels())
+            if prefix is None:
+                levels.clear()
+            else:
+                levels.pop(prefix, None)
+            self._store(levels)
+
+    def levels(self):
+        return self._levels
+
+    def _store(self, levels):
+        self._levels = levels
+        self._lookups = {}
+        self.generation += 1
+
+    def lookup(self, name):
+        """
+        Returns the level value registered for the longest prefix of name, or None if there is no match.
+        """
+        levels = self.levels()
+        lookups = self._lookups
+        if name not in lookups:
+            lookups[name] = next((levels[p] for p in prefixes(name) if p in levels), None)
+        return lookups[name]
+
+
+class SharedLevelRegistry(LevelRegistry):
+    """
+    A registry held in shared memory, so that changes made in any process take effect in all of them. The registry
+    must be created before the processes that use it, and passed to them (e.g. as an initializer argument of a
+    process pool, which calls install), or inherited by fork. E.g.
+
+        registry = SharedLevelRegistry()
+        log_levels.install(registry)
+        pool = multiprocessing.Pool(initializer=log_levels.install, initargs=(registry,))
+
+    The levels are stored as JSON in a fixed size buffer, guarded by a sequence number: writers make it odd while
+    writing, and readers retry if it was odd or changed while reading. Readers only re-read the buffer when the
+    sequence number has moved on from the one they last read.
+    """
+
+    def __init__(self, size=64 * 1024):
+        self._buffer = RawArray('c', size)
+        self._sequence = RawValue('Q', 0)
+        self._lock = Lock()
+        self._levels = {}
+        self._lookups = {}
+        self._read_sequence = 0
+
+    def __getstate__(self):
+        return {'_buffer': self._buffer, '_sequence': self._sequence, '_lock': self._lock}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._levels, self._lookups, self._read_sequence = {}, {}, 0
+
+    @property
+    def generation(self):
+        return self._sequence.value
+
+    def levels(self):
+        if self._sequence.value != self._read_sequence:
+            self._read()
+        return self._levels
+
+    def _read(self):
+        while True:
+            sequence = self._sequence.value
+            if sequence % 2:
+                continue
+            data = self._buffer.value
+            if self._sequence.value == sequence:
+                break
+        self._levels = json.loads(data.decode('utf-8')) if data else {}
+        self._lookups = {}
+        self._read_sequence = sequence
+
+    def _store(self, levels):
+        data = json.dumps(levels).encode('utf-8')
+        if len(data) >= len(self._buffer):
+            raise ValueError("Too many levels for the registry's buffer of {} bytes".format(len(self._buffer)))
+        self._sequence.value += 1
+        self._buffer.value = data
+        self._sequence.value += 1
+
+
+def install(registry):
+    global active
+    active = registry
+    return registry
+
+
+def uninstall():
+    global active
+    active = None
+
+
+def set_level(prefix, level):
+    """
+    Set the level for the subtree of loggers named prefix, installing a (process local) registry if there is none.
+    """
+    (active or install(LevelRegistry())).set_level(prefix, level)
+
+
+def clear(prefix=None):
+    if active is not None:
+        active.clear(prefix)
@@ -0,0 +1,201 @@
+"""
+Optional, low overhead instrumentation of the logger pipeline. Disabled by default, in which case each instrumented
+point in logger costs a single check of log_metrics.active. Once enabled, the logger records:
+
+    emitted.<LEVEL>          counter of entries written
+    below_level.<LEVEL>      counter of entries dropped by the logger's level
+    filtered.<LEVEL>         counter of entries dropped by filters (see log_filters)
+    reduce_context           histogram of time (ns) spent in the context reducer
+    write.<Logger class>     histogram of time (ns) spent in each sink's _write_to_log
+    worker.records           counter of entries forwarded by log_worker/log_pool_worker
+    worker.queue_depth       histogram of the worker's queue depth, sampled every 100 entries
+
+Metrics are kept in ordinary dicts per process, shared by all its threads, but not in shared memory: one process
+can't read another's metrics live (unlike the stats of LogWorkerPool, which are in a RawArray), as keeping every
+counter and histogram bucket in shared memory would cost far more per update, and the set of metrics isn't known
+up front. Counts may be slightly under-reported under heavy contention, as updates aren't locked. Instead each
+process can export a snapshot to a directory with export(), and the snapshots of several processes can be
+combined with load() or merge(). E.g.
+
+    log_metrics.enable(export_dir='/tmp/log_metrics')
+    ...
+    log_metrics.export()
+    print(log_metrics.load('/tmp/log_metrics'))
+"""
+import json
+import os
+from collections import defaultdict
+
+# The Metrics instance of this process, or None when disabled
+active = None
+
+
+class Histogram(object):
+    """
+    A histogram of non-negative integers with HdrHistogram-style log-linear buckets: each power of two range is
+    split into SUB_BUCKETS linear buckets, so recorded values are accurate to within 1/SUB_BUCKETS (about 6%)
+    over the whole 64 bit range, in a fixed amount of memory.
+    """
+
+    SUB_BUCKETS = 16
+
+    def __init__(self):
+        self.counts = [0] * (64 * self.SUB_BUCKETS)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    @classmethod
+    def index(cls, value):
+        if value < 2 * cls.SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - 5
+        return cls.SUB_BUCKETS * (shift + 1) + (value >> shift) - cls.SUB_BUCKETS
+
+    @classmethod
+    def lower_bound(cls, index):
+        if index < 2 * cls.SUB_BUCKETS:
+            return index
+        shift = index // cls.SUB_BUCKETS - 1
+        return (cls.SUB_BUCKETS + index % cls.SUB_BUCKETS) << shift
+
+    def record(self, value):
+        self.counts[self.index(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, p):
+        target = self.count * p / 100.0
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if c and seen >= target:
+                return min(self.lower_bound(i), self.max)
+        return self.max
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'p999': self.percentile(99.9),
+            'buckets': {str(i): c for i, c in enumerate(self.counts) if c},
+            'total': self.total,
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        h = cls()
+        for i, c in snapshot['buckets'].items():
+            h.counts[int(i)] = c
+        h.count, h.total, h.max = snapshot['count'], snapshot['total'], snapshot['max']
+        return h
+
+    def merge(self, other):
+        for i, c in enumerate(other.counts):
+            self.counts[i] += c
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        return self
+
+
+class Metrics(object):
+
+    def __init__(self, export_dir=None):
+        self.export_dir = export_dir
+        self.counters = defaultdict(int)
+        self.histograms = defaultdict(Histogram)
+
+    def incr(self, name, n=1):
+        self.counters[name] += n
+
+    def record(self, name, value):
+        self.histograms[name].record(value)
+
+    def snapshot(self):
+        return {
+            'pid': os.getpid(),
+            'counters': {_name(k): v for k, v in list(self.counters.items())},
+            'histograms': {_name(k): h.snapshot() for k, h in list(self.histograms.items())},
+        }
+
+
+def _name(key):
+    # Keys may be tuples, to save formatting a name on the hot path
+    return '.'.join(key) if isinstance(key, tuple) else key
+
+
+def enable(export_dir=None):
+    global active
+    active = Metrics(export_dir)
+    return active
+
+
+def disable():
+    global active
+    active = None
+
+
+def _reset_in_child():
+    # A forked child would otherwise inherit (and later re-export) the parent's counts
+    if active is not None:
+        enable(active.export_dir)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_in_child)
+
+
+def snapshot():
+    return active.snapshot() if active is not None else None
+
+
+def export(export_dir=None):
+    """
+    Write this process's snapshot as JSON to metrics_<pid>.json in export_dir (or the directory given to enable),
+    returning its path. Does nothing if metrics are disabled. Raises ValueError if no directory was given to either.
+    """
+    if active is None:
+        return None
+    export_dir = export_dir or active.export_dir
+    if not export_dir:
+        raise ValueError("No export_dir given, either to export() or to enable()")
+    os.makedirs(export_dir, exist_ok=True)
+    path = os.path.join(export_dir, 'metrics_{}.json'.format(os.getpid()))
+    with open(path, 'w') as f:
+        json.dump(active.snapshot(), f)
+    return path
+
+
+def merge(snapshots):
+    """
+    Combine snapshots (e.g. from several processes) into one, summing counters and merging histograms.
+    """
+    counters = defaultdict(int)
+    histograms = defaultdict(Histogram)
+    for s in snapshots:
+        for name, v in s['counters'].items():
+            counters[name] += v
+        for name, h in s['histograms'].items():
+            histograms[name].merge(Histogram.from_snapshot(h))
+    return {
+        'pids': [s['pid'] for s in snapshots],
+        'counters': dict(counters),
+        'histograms': {name: h.snapshot() for name, h in histograms.items()},
+    }
+
+
+def load(export_dir):
+    snapshots = []
+    for filename in sorted(os.listdir(export_dir)):
+        if filename.startswith('metrics_') and filename.endswith('.json'):
+            with open(os.path.join(export_dir, filename)) as f:
+                snapshots.append(json.load(f))
+    return merge(snapshots)
+
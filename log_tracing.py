@@ -0,0 +1,295 @@
+"""
+Lightweight tracing on top of logger: spans which time a block or function (wall and CPU time) and log a record when
+it finishes, and an optional sampling profiler which logs aggregated stacks for flame graphs. E.g.
+
+    with logger.span('request', path=path):
+        with span('db_query'):  # nested in the request span, and logged as 'request.db_query'
+            ...
+
+    @traced()
+    def handle(self, request):  # a method of a LoggingMixin, traced with self.logger
+        ...
+
+Each span is logged via a child logger of the logger it was started with (logger.new(span=name)), and the span's
+logger (span.logger) may be used to log within it. Spans started without a logger, or with the same logger as the
+enclosing span, use the enclosing span's logger, so the names of nested spans are flattened like logger names.
+Nesting follows contextvars, like bind_context, so spans nest correctly across threads (with
+ContextThreadPoolExecutor) and asyncio tasks. The CPU time is that of the thread, so for a coroutine which awaits it
+includes other coroutines run in the meantime.
+
+Overhead is bounded by sampling: only sample_rate of the top level spans are traced (along with all of their
+children, so traces are complete), and those which aren't cost little more than a random number. Spans shorter than
+min_duration_ms aren't logged.
+"""
+import functools
+import inspect
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from time import perf_counter_ns, thread_time_ns
+
+# The fraction of top level spans which are traced
+sample_rate = 1.0
+
+# Spans shorter than this aren't logged
+min_duration_ms = 0.0
+
+_current_span = ContextVar('log_tracing_current_span', default=None)
+
+
+def configure(rate=None, min_ms=None):
+    """
+    Set the module's sample_rate and/or min_duration_ms.
+    """
+    global sample_rate, min_duration_ms
+    if rate is not None:
+        sample_rate = rate
+    if min_ms is not None:
+        min_duration_ms = min_ms
+
+
+def current_span():
+    return _current_span.get()
+
+
+class span(object):
+    """
+    A span, used as a context manager or decorator (in which case each call of the function is a span). The record
+    logged has msg 'span', the span's context (including the flattened span name), and:
+
+        wall_ms, cpu_ms   the wall clock and (thread) CPU durations
+        trace_id          the id of the top level span
+        span_id           the id of this span
+        parent_id         the id of the enclosing span, if any
+        error             the name of the exception raised from the span, if any
+
+    The sample_rate of a top level span overrides the module's sample_rate.
+    """
+
+    def __init__(self, name, logger=None, level='INFO', sample_rate=None, **context):
+        self._name = name
+        self._base_logger = logger
+        self._level = level
+        self._sample_rate = sample_rate
+        self._context = context
+        self._logger = None
+        self._token = None
+        self.parent = None
+        self.sampled = False
+        self.trace_id = self.span_id = None
+
+    @property
+    def logger(self):
+        if self._logger is None:
+            base, parent = self._base_logger, self.parent
+            if parent is not None and (base is None or base is parent._base_logger):
+                # Continue the enclosing span's logger, so that the span names are nested
+                base = parent.logger
+            elif base is None:
+                raise ValueError("A span started outside of any other span needs a logger")
+            self._logger = base.new(span=self._name, **self._context)
+        return self._logger
+
+    def __enter__(self):
+        parent = self.parent = _current_span.get()
+        if parent is None:
+            rate = sample_rate if self._sample_rate is None else self._sample_rate
+            self.sampled = rate >= 1 or random.random() < rate
+        else:
+            self.sampled = parent.sampled
+
+        if self.sampled:
+            self.span_id = '{:016x}'.format(random.getrandbits(64))
+            self.trace_id = parent.trace_id if parent is not None else self.span_id
+            self._cpu_start = thread_time_ns()
+            self._wall_start = perf_counter_ns()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        _current_span.reset(self._token)
+        if not self.sampled:
+            return
+        wall_ms = (perf_counter_ns() - self._wall_start) / 1e6
+        cpu_ms = (thread_time_ns() - self._cpu_start) / 1e6
+        if wall_ms < min_duration_ms:
+            return
+
+        record = {'wall_ms': round(wall_ms, 3), 'cpu_ms': round(cpu_ms, 3), 'trace_id': self.trace_id,
+                  'span_id': self.span_id}
+        if self.parent is not None:
+            record['parent_id'] = self.parent.span_id
+        if exc_type is not None:
+            record['error'] = exc_type.__name__
+        self.logger.log('span', self._level, **record)
+
+    def __call__(self, f):
+        args = (self._name, self._base_logger, self._level, self._sample_rate)
+        context = self._context
+
+        if inspect.iscoroutinefunction(f):
+            @functools.wraps(f)
+            async def wrapper(*a, **kw):
+                with span(*args, **context):
+                    return await f(*a, **kw)
+        else:
+            @functools.wraps(f)
+            def wrapper(*a, **kw):
+                with span(*args, **context):
+                    return f(*a, **kw)
+
+        return wrapper
+
+
+def traced(name=None, level='INFO', **context):
+    """
+    A decorator for methods of LoggingMixin (or of any object with a logger attribute), making each call a span
+    logged with the object's logger. The span is named after the method, unless given a name.
+    """
+    def decorate(f):
+        span_name = name or f.__name__
+
+        if inspect.iscoroutinefunction(f):
+            @functools.wraps(f)
+            async def wrapper(self, *a, **kw):
+                with span(span_name, self.logger, level, **context):
+                    return await f(self, *a, **kw)
+        else:
+            @functools.wraps(f)
+            def wrapper(self, *a, **kw):
+                with span(span_name, self.logger, level, **context):
+                    return f(self, *a, **kw)
+
+        return wrapper
+    return decorate
+
+
+class SamplingProfiler(object):
+    """
+    A statistical profiler: a daemon thread which samples the stacks of all other threads every interval seconds,
+    and every report_interval seconds (and on stop) logs the most frequently sampled stacks, as records with msg
+    'profile' and:
+
+        stack     the stack in collapsed form, outermost first, e.g. 'module.main;module.handle;module.query'
+        samples   the number of times the stack was sampled
+        share     the stack's fraction of all samples in the period
+
+    which may be turned into a flame graph, e.g. with flamegraph.pl, from lines of '<stack> <samples>'. Overhead is
+    bounded by the sampling interval (each sample costs in the order of microseconds per frame), and the volume of
+    records by max_stacks per report (the remaining samples are reported as a single 'other' stack).
+    """
+
+    def __init__(self, logger, interval=0.05, report_interval=60.0, max_stacks=50, max_depth=64, level='INFO'):
+        self._logger = logger
+        self._interval = interval
+        self._report_interval = report_interval
+        self._max_stacks = max_stacks
+        self._max_depth = max_depth
+        self._level = level
+        self._counts = Counter()
+        self._labels = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='SamplingProfiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _run(self):
+        next_report = time.monotonic() + self._report_interval
+        while not self._stop.wait(self._interval):
+            self.sample()
+            if time.monotonic() >= next_report:
+                self.report()
+                next_report += self._report_interval
+        self.report()
+
+    def sample(self):
+        own = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident != own:
+                self._counts[self._stack(frame)] += 1
+
+    def _stack(self, frame):
+        labels = self._labels
+        stack = []
+        while frame is not None and len(stack) < self._max_depth:
+            code = frame.f_code
+            label = labels.get(code)
+            if label is None:
+                label = labels[code] = '{}.{}'.format(frame.f_globals.get('__name__', '?'), code.co_name)
+            stack.append(label)
+            frame = frame.f_back
+        return ';'.join(reversed(stack))
+
+    def report(self):
+        counts, self._counts = self._counts, Counter()
+        total = sum(counts.values())
+        if not total:
+            return
+        top = counts.most_common(self._max_stacks)
+        other = total - sum(n for _, n in top)
+        if other:
+            top.append(('other', other))
+        for stack, n in top:
+            self._logger.log('profile', self._level, stack=stack, samples=n, share=round(n / total, 4),
+                             interval_ms=self._interval * 1e3)
+
+
+if __name__ == '__main__':
+    import asyncio
+    # Run as a script this module is __main__, a copy of the log_tracing module which logger uses
+    import log_tracing
+    from logger import LoggingMixin, PrintLogger
+
+    class Service(LoggingMixin):
+        @log_tracing.traced()
+        def handle(self, n):
+            with log_tracing.span('parse'):
+                sum(i * i for i in range(n))
+            self.query(n)
+
+        @log_tracing.traced(table='users')
+        def query(self, n):
+            time.sleep(n / 1e6)
+
+    service = Service(PrintLogger(name='svc'))
+    with service.span('request', path='/users'):
+        service.handle(100000)
+
+    @log_tracing.span('fetch', PrintLogger(name='async'))
+    async def fetch():
+        await asyncio.sleep(0.01)
+
+    asyncio.get_event_loop().run_until_complete(fetch())
+
+    log_tracing.configure(rate=0)
+    with service.span('unsampled'):
+        pass
+
+    def busy(seconds):
+        end = time.monotonic() + seconds
+        while time.monotonic() < end:
+            sum(range(1000))
+
+    with log_tracing.SamplingProfiler(PrintLogger(name='profiler'), interval=0.01, max_stacks=3):
+        worker = threading.Thread(target=busy, args=(0.3,))
+        worker.start()
+        worker.join()
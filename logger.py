@@ -1,11 +1,27 @@
+import contextvars
+import copy
 import datetime
+import functools
+import inspect
+import os
+import pickle
 import sys
+import threading
+import time
 import traceback
-from multiprocessing import Process, Manager
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Event, Process, Manager, Queue, RawArray
+from time import perf_counter_ns
 
 import enum
 from queue import Empty
 
+import log_levels
+import log_metrics
+import log_tracing
+
 
 def log_worker(log_q, logger):
     """
@@ -21,6 +37,7 @@ def log_worker(log_q, logger):
     :return:
     """
     do_loop = True
+    count = 0
 
     while do_loop:
         try:
@@ -29,9 +46,72 @@ def log_worker(log_q, logger):
                 do_loop = False
             else:
                 logger.log(**log_item)
+                count += 1
+                _worker_metrics(log_q, count)
         except Empty:
             do_loop = False
 
+    _export_worker_metrics()
+
+
+def _worker_metrics(log_q, count):
+    metrics = log_metrics.active
+    if metrics is not None:
+        metrics.incr('worker.records')
+        if count % 100 == 0:
+            metrics.record('worker.queue_depth', log_q.qsize())
+
+
+def _export_worker_metrics():
+    if log_metrics.active is not None and log_metrics.active.export_dir:
+        log_metrics.export()
+
+
+# Layout of each log_pool_worker's slot in the shared stats array
+STAT_RECORDS, STAT_ERRORS, STAT_LAG_TOTAL, STAT_LAG_MAX = range(4)
+STATS_PER_WORKER = 4
+
+
+def log_pool_worker(log_q, logger, stop, stats, slot, poll_interval=0.1):
+    """
+    A log_worker for use in a LogWorkerPool. Takes (enqueue time, log item) pairs from the queue and passes the log
+    items on to another logger, publishing its throughput and queue lag into its slot of the shared stats array.
+
+    Rather than waiting for a 'None' value, the worker finishes once the stop event has been set and the queue has
+    been empty for poll_interval seconds, so there's no need for every producer to signal it's done.
+
+    :param log_q: the multiprocessing Queue to poll for log items.
+    :param logger: the output logger to forward on to.
+    :param stop: a multiprocessing Event, set by the controlling process once producers have finished.
+    :param stats: a shared array of doubles, STATS_PER_WORKER for each worker.
+    :param slot: the index of this worker's stats within the array.
+    """
+    base = slot * STATS_PER_WORKER
+    count = 0
+
+    while True:
+        try:
+            enqueued, log_item = log_q.get(timeout=poll_interval)
+        except Empty:
+            if stop.is_set():
+                break
+            continue
+
+        lag = time.time() - enqueued
+        try:
+            logger.log(**log_item)
+        except Exception:
+            stats[base + STAT_ERRORS] += 1
+        stats[base + STAT_RECORDS] += 1
+        stats[base + STAT_LAG_TOTAL] += lag
+        if lag > stats[base + STAT_LAG_MAX]:
+            stats[base + STAT_LAG_MAX] = lag
+        count += 1
+        _worker_metrics(log_q, count)
+
+    logger.end_logging()
+    _export_worker_metrics()
+
 """ TODO:
 
 Enable a logger to be passed around to various classes/functions/processes and for each location to setup a unique
@@ -91,11 +171,26 @@ def flatten_context(context):
 
         recurse(context, k, accum)
 
-        return separator.join(accum)
+        # A value supplied by a single level is kept as is (so numbers stay numbers); only values supplied by several
+        # levels are hierarchical, and joined
+        return accum[0] if len(accum) == 1 else separator.join(map(str, accum))
 
     return {k: reduce_dict_value(context, k) for k, v in context.items() if not k == 'parent'}
 
 
+def flatten_value(context, key, separator='.'):
+    """
+    Flatten the values of a single key up the context hierarchy, in order parent->child. Equivalent to
+    flatten_context(context)[key], but without flattening any other keys, and giving '' where no level has the key.
+    """
+    values = []
+    while context:
+        if key in context:
+            values.append(context[key])
+        context = context.get('parent')
+    return values[0] if len(values) == 1 else separator.join(map(str, reversed(values)))
+
+
 def context_as_is(context):
     return {k: v for k, v in context.items() if not k == 'parent'}
 
@@ -127,7 +222,7 @@ def make_context_flatmap(*selected, separator=None):
 
             recurse(context, k, accum)
 
-            return separator.join(accum)
+            return accum[0] if len(accum) == 1 else separator.join(map(str, accum))
 
         return {k: reduce_dict_value(context, k) if k in selected or '*' in selected else v
                 for k, v in context.items() if not k == 'parent'}
@@ -135,6 +230,80 @@ def make_context_flatmap(*selected, separator=None):
     return context_flatmap
 
 
+# The bound context, and the state it replaced (restored when the binding exits), as a linked stack
+_bound_context = contextvars.ContextVar('logger_bound_context', default=({}, None))
+
+
+class bind_context(object):
+    """
+    Binds key-value context to the current execution context, to be included in every log entry made by any logger
+    within the block or decorated function. This avoids creating a logger per request/task just to attach, say, a
+    request id. E.g.
+
+        with bind_context(request_id=request.id):
+            handle(request)  # logging within handle includes the request_id
+
+        @bind_context(component='billing')
+        async def charge(...):
+            ...
+
+    This saves allocating a logger per request, but not time: entering and leaving a binding costs about as much as
+    Logger.new(), as setting a context variable copies the context's mapping (see logger_bench.py context).
+
+    Bindings nest, inner bindings taking precedence. Being based on contextvars, bound context follows the flow of
+    execution across await points, and into asyncio tasks created within the block. Use ContextThreadPoolExecutor
+    (or contextvars.copy_context().run) to carry it into thread pool tasks.
+    """
+
+    def __init__(self, **context):
+        self._context = context
+
+    def __enter__(self):
+        # The previous state is kept in the context variable rather than on this instance, so that an instance may
+        # be entered concurrently by several threads or tasks. With nothing bound already, this binding's context
+        # is used as is rather than copied.
+        state = _bound_context.get()
+        bound = state[0]
+        _bound_context.set(({**bound, **self._context} if bound else self._context, state))
+        return self
+
+    def __exit__(self, *exc_info):
+        _bound_context.set(_bound_context.get()[1])
+
+    def __call__(self, f):
+        context = self._context
+
+        if inspect.iscoroutinefunction(f):
+            @functools.wraps(f)
+            async def wrapper(*args, **kwargs):
+                with bind_context(**context):
+                    return await f(*args, **kwargs)
+        else:
+            @functools.wraps(f)
+            def wrapper(*args, **kwargs):
+                with bind_context(**context):
+                    return f(*args, **kwargs)
+
+        return wrapper
+
+
+def bound_context():
+    """
+    Returns the context currently bound with bind_context.
+    """
+    return dict(_bound_context.get()[0])
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """
+    A ThreadPoolExecutor which runs each task in a copy of the submitting thread's context, so that context bound
+    with bind_context at submission is included in log entries made by the task.
+    """
+
+    def submit(self, fn, *args, **kwargs):
+        return super(ContextThreadPoolExecutor, self).submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
 class Logger(object):
     """
     Base logger class, sets out the API for logging. Log entries are structured into a dictionary which includes:
@@ -152,6 +321,9 @@ class Logger(object):
     Each subclass is at liberty to decide how to format the details dictionary and where to route output.
     """
 
+    _filters = ()
+    _level_stamp = None
+
     def __init__(self, level=None, context_reducer=None, **context):
         level = level or 'INFO'
         self._reduce_context = context_reducer or flatten_context
@@ -164,6 +336,9 @@ class Logger(object):
     def new(self, **context):
         new_logger = self.clone()
         new_logger._context = merge_context(self._context, context)
+        new_logger._filters = self._filters
+        # The clone may be a copy of this logger, with this logger's level stamp, which is for this logger's name
+        new_logger._level_stamp = None
         new_logger.set_parent(self)
         return new_logger
 
@@ -190,6 +365,7 @@ class Logger(object):
             self._level = Level(level)
         else:
             self._level = Level[level]
+        self._level_stamp = None
 
     def set_parent(self, parent):
         self._parent = parent
@@ -218,24 +394,100 @@ class Logger(object):
         """
         return self.log("Exception: {}".format(exc), level="ERROR", exc_info=traceback.format_exc())
 
+    def add_filter(self, log_filter):
+        """
+        Adds a filter (see log_filters), which is called as log_filter(logger, msg, level, context) for each record
+        passing the level check, before the record is constructed. If any filter returns False the record is dropped.
+        Filters are inherited by loggers subsequently created with new().
+
+        :param log_filter: the filter callable
+        :return: self
+        """
+        self._filters = self._filters + (log_filter,)
+        return self
+
+    def span(self, name, level='INFO', sample_rate=None, **context):
+        """
+        A tracing span (see log_tracing), logged via a child logger of this logger, used as a context manager or
+        decorator, e.g. `with logger.span('query', table='users'):`
+
+        :param name: the span name, nested under the names of enclosing spans started from this logger
+        :return: the span
+        """
+        return log_tracing.span(name, self, level, sample_rate, **context)
+
+    @property
+    def name(self):
+        """
+        The flattened 'name' value of this logger's context hierarchy, e.g. 'svc.db'
+        """
+        if getattr(self, '_name_context', None) is not self._context:
+            self._name = str(flatten_value(self._context, 'name'))
+            self._name_context = self._context
+        return self._name
+
     def log(self, msg, level="INFO", **context):
         level = Level[level] if level else self._level
-        if level.value < self._level.value:
+        threshold = self._level.value if log_levels.active is None else self._registry_level(log_levels.active)
+        if level.value < threshold:
+            if log_metrics.active is not None:
+                log_metrics.active.incr(('below_level', level.name))
             return
+        for log_filter in self._filters:
+            if not log_filter(self, msg, level, context):
+                if log_metrics.active is not None:
+                    log_metrics.active.incr(('filtered', level.name))
+                return
+        self._emit(msg, level, context)
+
+    def _registry_level(self, registry):
+        """
+        The level value for this logger under the installed level registry (see log_levels), cached until the
+        registry next changes, or another registry is installed.
+        """
+        generation = registry.generation
+        stamp = self._level_stamp
+        if stamp is None or stamp[0] is not registry or stamp[1] != generation:
+            value = registry.lookup(self.name)
+            stamp = self._level_stamp = (registry, generation, self._level.value if value is None else value)
+        return stamp[2]
+
+    def _emit(self, msg, level, context):
+        details = self._details(msg, level, context)
+        metrics = log_metrics.active
+        if metrics is None:
+            self._write_to_log(details)
+        else:
+            metrics.incr(('emitted', level.name))
+            t0 = perf_counter_ns()
+            self._write_to_log(details)
+            metrics.record(('write', self.__class__.__name__), perf_counter_ns() - t0)
+        # self._log_next(msg, level, **kwargs)
 
+    def _details(self, msg, level, context, timestamp=None, bound=None):
+        """
+        Construct the details dictionary for a log entry. The timestamp (a datetime) and bound context default to
+        the current time and currently bound context, but may be given where construction of the entry is deferred.
+        """
         details = {
             'level': level.name,
             'msg': msg,
-            'timestamp': datetime.datetime.now().isoformat()
+            'timestamp': (timestamp or datetime.datetime.now()).isoformat()
         }
         details.update(self._context)
-        # Explicitly provided context takes precedence over logger-wide context
-        # details.update(self._context)
+        # Ambient context bound with bind_context takes precedence over logger-wide context, and explicitly provided
+        # context takes precedence over both
+        details.update(_bound_context.get()[0] if bound is None else bound)
         details.update(context)
 
-        details = self.top()._reduce_context(details)
-        self._write_to_log(details)
-        # self._log_next(msg, level, **kwargs)
+        reduce_context = self.top()._reduce_context
+        metrics = log_metrics.active
+        if metrics is None:
+            return reduce_context(details)
+        t0 = perf_counter_ns()
+        details = reduce_context(details)
+        metrics.record('reduce_context', perf_counter_ns() - t0)
+        return details
 
     def _log_next(self, msg, level, **kwargs):
         if self._parent:
@@ -271,6 +523,10 @@ class StreamLogger(Logger):
         log_line = str(details) + "\n"
         self._stream.write(log_line)
 
+    def end_logging(self):
+        # Worker processes exit without flushing their streams, so anything buffered must be written out here
+        self._stream.flush()
+
 
 class PrintLogger(StreamLogger):
     """
@@ -282,6 +538,9 @@ class PrintLogger(StreamLogger):
     def __init__(self, level=None, **context):
         super(PrintLogger, self).__init__(sys.stdout, level, **context)
 
+    def clone(self):
+        return self.__class__(self._level, **self._context)
+
 
 class FileLogger(StreamLogger):
 
@@ -295,6 +554,10 @@ class MpQueueLogger(Logger):
     logger implementation which routes log entries to a multiprocessing queue. The queue must be provided in the ctor.
     """
 
+    _wire = None
+    _wire_filters = None
+    _wire_registered = False
+
     def __init__(self, q, level=None, **context):
         super(MpQueueLogger, self).__init__(level, **context)
         self._q = q
@@ -308,6 +571,196 @@ class MpQueueLogger(Logger):
     def clone(self):
         return self.__class__(self._q, self._level, **self._context)
 
+    def new(self, **context):
+        new_logger = super(MpQueueLogger, self).new(**context)
+        new_logger._wire_registered = self._wire_registered
+        return new_logger
+
+    def __reduce__(self):
+        """
+        Pickles to a compact wire form, for cheap submission of loggers to process pool tasks: the id of the root
+        logger's definition, that definition (pickled once, and only unpickled by a process which hasn't already
+        seen it), the context added below the root by new(), the level, and the filters if they differ from the
+        root's (filters added with add_filter below the root are pickled with every task). The definition holds the
+        root's queue, level, context, filters and context reducer, so these must be picklable. Each process keeps
+        the root loggers it has restored, so its queue connection is made once, lazily on first use, rather than
+        for every task.
+
+        Loggers returned by pool_registration (and created from them with new()) leave the definition out, so a task
+        carries only the id and the deltas.
+        """
+        root, deltas = self._wire_root()
+        wire_id, definition = root._wire_definition()
+        if self._wire_registered:
+            definition = None
+        filters = self._filters if self._filters is not root._wire_filters else None
+        return _from_wire, (wire_id, definition, deltas, self._level.value, filters)
+
+    def pool_registration(self):
+        """
+        Registers this logger's definition with the workers of a process pool (multiprocessing.Pool or
+        ProcessPoolExecutor) as they start, so that tasks needn't carry it. E.g.
+
+            initializer, initargs, pool_logger = logger.pool_registration()
+            with Pool(4, initializer, initargs) as pool:
+                pool.map(task, [(pool_logger.new(item=i), i) for i in items])
+
+        The returned logger, and those created from it with new(), pickle to just the definition's id, so must only
+        be sent to pools created with the initializer. This logger is unchanged, and may still be sent anywhere.
+
+        :return: a tuple (initializer, initargs, logger)
+        """
+        root, _ = self._wire_root()
+        wire_id, definition = root._wire_definition()
+        registered = copy.copy(self)
+        registered._wire_registered = True
+        return _register_wire, (wire_id, definition), registered
+
+    def _wire_root(self):
+        """
+        The root MpQueueLogger of this logger, found by following its parents while they're MpQueueLoggers it was
+        created from by new(), and the context deltas added by each new() since, in order.
+        """
+        logger, deltas = self, []
+        parent = logger._parent
+        while isinstance(parent, MpQueueLogger) and _created_from(logger, parent):
+            deltas.append(context_as_is(logger._context))
+            logger, parent = parent, parent._parent
+        return logger, tuple(reversed(deltas))
+
+    def _wire_definition(self):
+        if self._wire is None:
+            q = self._q
+            q_blob = q.blob if isinstance(q, _LazyQueue) else pickle.dumps(q, pickle.HIGHEST_PROTOCOL)
+            definition = pickle.dumps((q_blob, self._level.value, self._context, self._filters, self._reduce_context),
+                                      pickle.HIGHEST_PROTOCOL)
+            self._wire = (uuid.uuid4().hex, definition)
+            self._wire_filters = self._filters
+        return self._wire
+
+
+def _created_from(logger, parent):
+    # Whether logger was created by parent.new(), rather than being chained to it. merge_context only links to the
+    # parent context when it isn't empty.
+    return logger._context.get('parent') is (parent._context or None)
+
+
+# Root loggers restored from their wire form in this process, by definition id (see MpQueueLogger.__reduce__)
+_wire_roots = {}
+
+
+def _wire_root_from(wire_id, definition):
+    q_blob, level, context, filters, reduce_context = pickle.loads(definition)
+    root = MpQueueLogger(_LazyQueue(q_blob), level, context_reducer=reduce_context, **context)
+    root._filters = root._wire_filters = filters
+    root._wire = (wire_id, definition)
+    return root
+
+
+def _register_wire(wire_id, definition):
+    if wire_id not in _wire_roots:
+        _wire_roots[wire_id] = _wire_root_from(wire_id, definition)
+
+
+def _from_wire(wire_id, definition, deltas, level, filters=None):
+    root = _wire_roots.get(wire_id)
+    if root is None:
+        if definition is None:
+            # Raising here, while a pool's worker unpickles a task, would kill the worker and hang the pool, so the
+            # error is raised on use instead, from the task
+            root = MpQueueLogger(_UnregisteredQueue(wire_id), level)
+        else:
+            root = _wire_roots[wire_id] = _wire_root_from(wire_id, definition)
+
+    logger = root
+    for delta in deltas:
+        logger = logger.new(**delta)
+    if filters is not None:
+        logger._filters = filters
+    if logger._level.value != level:
+        logger.set_level(level)
+    return logger
+
+
+class _UnregisteredQueue(object):
+    """
+    Stands in for the queue of a logger whose definition wasn't registered in this process (see
+    MpQueueLogger.pool_registration).
+    """
+
+    def __init__(self, wire_id):
+        self._wire_id = wire_id
+
+    def put(self, item):
+        raise RuntimeError("Logger definition {} isn't registered in this process, create the pool with the "
+                           "initializer from the logger's pool_registration".format(self._wire_id))
+
+
+class _LazyQueue(object):
+    """
+    Stands in for a pickled queue (proxy), which is only unpickled, and so connected to, on first use.
+    """
+
+    def __init__(self, blob):
+        self.blob = blob
+        self._q = None
+
+    def __getattr__(self, name):
+        if self._q is None:
+            self._q = pickle.loads(self.blob)
+        return getattr(self._q, name)
+
+    def __reduce__(self):
+        return _LazyQueue, (self.blob,)
+
+
+class _DeferredQueue(object):
+    """
+    Stands in for a queue which is only created on first use, by calling factory. Pickles as the queue itself.
+
+    A process forked before the queue was created can't share it, so creating the queue in such a process is an
+    error, rather than its log entries silently going to a queue of its own.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._queue = None
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    @property
+    def created(self):
+        return self._queue is not None
+
+    @property
+    def queue(self):
+        if self._queue is None:
+            with self._lock:
+                if self._queue is None:
+                    if os.getpid() != self._pid:
+                        raise RuntimeError("The log queue must be created (e.g. by logging, or starting the log "
+                                           "worker) before forking processes which use it")
+                    self._queue = self._factory()
+        return self._queue
+
+    def put(self, item):
+        self.queue.put(item)
+
+    def __getattr__(self, name):
+        return getattr(self.queue, name)
+
+    def __reduce__(self):
+        return _queue_as_is, (self.queue,)
+
+
+def _queue_as_is(q):
+    return q
+
+
+def _managed_queue():
+    # The proxy keeps a reference to its manager, so the manager process lives as long as the queue
+    return Manager().Queue()
+
 
 class AutomatedMpQueueLogger(MpQueueLogger):
     """
@@ -332,13 +785,16 @@ class AutomatedMpQueueLogger(MpQueueLogger):
         logger.end_logging()
         mp_logger.join()
 
-    Note that it's possible to pass the logger across a process boundary, including to functions within a process
-    pool.
+    The queue is only created when first needed: on the first log entry, on start, or when the logger is pickled to
+    another process. Processes which inherit the logger by fork must be started after the queue has been created. By
+    default it's a managed queue, so that the logger can be passed to functions within a process pool (the worker
+    process isn't pickled, and the logger is received as an MpQueueLogger, see MpQueueLogger.__reduce__). Starting
+    the manager's server process takes a significant fraction of a second, so where the logger is only passed to
+    processes as they're created (e.g. as a Process argument) managed=False uses a plain multiprocessing.Queue
+    instead.
     """
-    def __init__(self, level=None, **context):
-        # Use a managed queue so the logger can be passed to functions within process pools
-        m = Manager()
-        q = m.Queue()
+    def __init__(self, level=None, managed=True, **context):
+        q = _DeferredQueue(_managed_queue if managed else Queue)
         super(AutomatedMpQueueLogger, self).__init__(q, level, **context)
         self._worker = None
 
@@ -346,7 +802,7 @@ class AutomatedMpQueueLogger(MpQueueLogger):
         if self._next is None:
             raise Exception("No log chain exists.")
         self._next.log("Starting the log worker.")
-        self._worker = Process(target=log_worker, args=(self._q, self._next))
+        self._worker = Process(target=log_worker, args=(self._q.queue, self._next))
         self._worker.start()
 
     def join(self):
@@ -355,22 +811,130 @@ class AutomatedMpQueueLogger(MpQueueLogger):
     def terminate(self):
         self._worker.terminate()
 
+    def end_logging(self):
+        # Nothing can be waiting on a queue which was never created
+        if self._q.created:
+            super(AutomatedMpQueueLogger, self).end_logging()
+
     def _log_next(self, msg, level, **context):
         # Disable the log chaining here, as the "next" logging is done in the worker process
         pass
 
-    def __getstate__(self):
-        # pickle everything but the worker
-        return {'_context': self._context, '_level': self._level, '_q': self._q}
-
-    def __setstate__(self, state):
-        self.__dict__.update(state)
-
     def clone(self):
         # Return a MpQueueLogger instance as we don't want to duplicate the queue or worker
         return MpQueueLogger(self._q, self._level, **self._context)
 
 
+class ShardedMpQueueLogger(Logger):
+    """
+    logger implementation which routes log entries to one of several multiprocessing queues, chosen by a hash of the
+    (flattened) value of the shard_key context item, so that all entries from a given source go to the same queue
+    and so retain their order. Entries are queued with their enqueue time, for the worker to measure queue lag.
+    Intended to be created by LogWorkerPool.logger.
+    """
+
+    def __init__(self, queues, level=None, shard_key='name', **context):
+        super(ShardedMpQueueLogger, self).__init__(level, **context)
+        self._queues = queues
+        self._shard_key = shard_key
+
+    def _write_to_log(self, details):
+        shard = str(details.get(self._shard_key, '')).encode('utf-8')
+        self._queues[zlib.crc32(shard) % len(self._queues)].put((time.time(), details))
+
+    def clone(self):
+        return self.__class__(self._queues, self._level, self._shard_key, **self._context)
+
+
+class LogWorkerPool(object):
+    """
+    A pool of log_pool_worker processes, each draining its own queue into its own copy of a sink logger, so that a
+    slow sink doesn't bottleneck every producer. Log entries are sharded across the queues by a context key (the
+    flattened 'name' by default) so per-source ordering is kept. E.g.
+
+        pool = LogWorkerPool(FileLogger('out.log'), workers=4)
+        pool.start()
+        logger = pool.logger(name='svc')
+
+        with multiprocessing.Pool() as p:  # the logger may be passed to pool tasks
+            p.map(functools.partial(work, logger=logger), items)
+
+        pool.join()  # drains the queues then stops the workers
+        print(pool.metrics())
+
+    As with AutomatedMpQueueLogger, managed queues are used so that loggers can be passed to process pool tasks.
+    """
+
+    def __init__(self, sink, workers=2, shard_key='name', poll_interval=0.1):
+        self._sink = sink
+        self._shard_key = shard_key
+        self._poll_interval = poll_interval
+        self._manager = Manager()
+        self._queues = [self._manager.Queue() for _ in range(workers)]
+        self._stop = Event()
+        self._stats = RawArray('d', workers * STATS_PER_WORKER)
+        self._workers = []
+        self._started = None
+        self._final_sizes = None
+
+    def logger(self, level=None, **context):
+        return ShardedMpQueueLogger(self._queues, level, self._shard_key, **context)
+
+    def start(self):
+        self._started = time.time()
+        self._workers = [
+            Process(target=log_pool_worker,
+                    args=(q, self._sink, self._stop, self._stats, i, self._poll_interval))
+            for i, q in enumerate(self._queues)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def join(self):
+        """
+        Signal the workers to finish once their queues are drained, and wait for them, then shut down the queues'
+        manager. Should be called once all producers are done, as entries logged afterwards are not written.
+        """
+        self._stop.set()
+        for worker in self._workers:
+            worker.join()
+        self._shutdown()
+
+    def terminate(self):
+        for worker in self._workers:
+            worker.terminate()
+        for worker in self._workers:
+            worker.join()
+        self._shutdown()
+
+    def _shutdown(self):
+        # The queues are gone with the manager, so their final sizes are kept for metrics
+        if self._final_sizes is None:
+            self._final_sizes = [q.qsize() for q in self._queues]
+            self._manager.shutdown()
+
+    def metrics(self):
+        """
+        A snapshot of each worker's metrics: records written, write errors, throughput (records/sec since start),
+        mean and max queue lag (seconds) and the current depth of its queue.
+        """
+        elapsed = time.time() - self._started if self._started else 0
+        result = []
+        for i, q in enumerate(self._queues):
+            base = i * STATS_PER_WORKER
+            records = self._stats[base + STAT_RECORDS]
+            result.append({
+                'worker': i,
+                'records': int(records),
+                'errors': int(self._stats[base + STAT_ERRORS]),
+                'records_per_sec': records / elapsed if elapsed else 0.0,
+                'mean_lag': self._stats[base + STAT_LAG_TOTAL] / records if records else 0.0,
+                'max_lag': self._stats[base + STAT_LAG_MAX],
+                'queue_size': q.qsize() if self._final_sizes is None else self._final_sizes[i],
+            })
+        return result
+
+
 class BufferedLogger(Logger):
     """
     logger implementation which keeps log entries in a list buffer until explicitly cleared.
@@ -391,6 +955,81 @@ class BufferedLogger(Logger):
         self.buffer = []
 
 
+class RingBufferLogger(Logger):
+    """
+    logger implementation which keeps the last `capacity` log entries, at all levels, in a fixed size ring buffer,
+    and only writes them out to the sink logger when an entry at or above trigger_level is logged (or exception is
+    called). This gives the detail of DEBUG logging around a failure without the cost of writing it all out.
+    E.g.
+
+        logger = RingBufferLogger(FileLogger('crash.log'), capacity=500)
+        logger.log("Fetching page", level="DEBUG", page=n)  # held in memory only
+        logger.log("Fetch failed", level="ERROR")  # writes out the preceding entries, then this one
+
+    Entries are held in the buffer unconstructed, the details dictionary only being built for entries which are
+    written out. Entries are written to the sink's _write_to_log, so the sink's level and context are not applied.
+    Loggers created with new() share the buffer.
+    """
+
+    def __init__(self, sink, capacity=1000, trigger_level='ERROR', level='DEBUG', **context):
+        super(RingBufferLogger, self).__init__(level, **context)
+        self._sink = sink
+        self._trigger = trigger_level if isinstance(trigger_level, Level) else Level[trigger_level]
+        self._ring = _Ring(capacity)
+
+    def clone(self):
+        return copy.copy(self)
+
+    def _emit(self, msg, level, context):
+        self._ring.append((self, msg, level, context, datetime.datetime.now(), _bound_context.get()[0]))
+        if level.value >= self._trigger.value:
+            self.dump()
+
+    def _write_to_log(self, details):
+        self._sink._write_to_log(details)
+
+    def exception(self, exc):
+        super(RingBufferLogger, self).exception(exc)
+        self.dump()
+
+    def dump(self):
+        """
+        Write out and clear the buffered entries, oldest first.
+        """
+        for logger, msg, level, context, timestamp, bound in self._ring.drain():
+            self._write_to_log(logger._details(msg, level, context, timestamp, bound))
+
+    def clear(self):
+        self._ring.drain()
+
+    def end_logging(self):
+        self.clear()
+
+
+class _Ring(object):
+
+    def __init__(self, capacity):
+        self._items = [None] * capacity
+        self._next = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def append(self, item):
+        with self._lock:
+            self._items[self._next] = item
+            self._next = (self._next + 1) % len(self._items)
+            if self._count < len(self._items):
+                self._count += 1
+
+    def drain(self):
+        with self._lock:
+            start = self._next - self._count
+            items = self._items[start:] + self._items[:self._next] if start < 0 else self._items[start:self._next]
+            self._items[:] = [None] * len(self._items)
+            self._count = 0
+        return items
+
+
 class LoggingMixin(object):
     """
     A convenience mixin class for injecting logging methods into any class needing access to logging facilities.
@@ -427,6 +1066,9 @@ class LoggingMixin(object):
         self.logger.exception(*args, **context)
         return self
 
+    def span(self, *args, **context):
+        return self.logger.span(*args, **context)
+
     def end_logging(self):
         self.logger.end_logging()
 
@@ -443,3 +1085,13 @@ if __name__ == '__main__':
     p3 = p2.new(name='logger_3')
     p3.log("Hello 3")
     p3.log("Hello 4", foo='qux')
+
+    # Loggers created with new() pickle relative to their root's definition, even when the root has no context
+    mp_root = MpQueueLogger(_LazyQueue(pickle.dumps(None)))
+    children = [mp_root.new(name='child{}'.format(i)) for i in range(3)]
+    wire_ids = {child.__reduce__()[1][0] for child in children}
+    assert wire_ids == {mp_root._wire[0]}, wire_ids
+    restored = [pickle.loads(pickle.dumps(child)) for child in children]
+    assert [r._context for r in restored] == [{'name': 'child{}'.format(i)} for i in range(3)]
+    assert len({id(r.top()) for r in restored}) == 1
+    print("{} children share wire definition {}".format(len(children), mp_root._wire[0]))
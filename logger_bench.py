@@ -0,0 +1,321 @@
+"""
+Benchmarks for logger. Run all benchmarks, or those named on the command line:
+
+    python logger_bench.py [name ...]
+"""
+import asyncio
+import functools
+import io
+import json
+import os
+import tempfile
+import multiprocessing
+import sys
+import time
+
+import log_levels
+import log_metrics
+from async_logger import AsyncLogger
+from ndjson_logger import NdjsonLogger, read_ndjson
+from logger import (AutomatedMpQueueLogger, BufferedLogger, Level, MpQueueLogger, NullLogger, RingBufferLogger,
+                    StreamLogger, bind_context, flatten_context, log_worker)
+
+
+def timed(f, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        f()
+    return (time.perf_counter() - t0) / n
+
+
+def bench_context(n=100000, repeat=5):
+    """
+    Attaching a request id to the log entries of each request, either by creating a child logger per request or by
+    binding ambient context: the cost of attaching it alone, and of a 'request' which logs three entries (best of
+    repeat runs). Binding saves the child logger's allocation, but costs about the same time as new(), as setting a
+    context variable is itself a copy (of the context's mapping).
+    """
+    root = NullLogger(name='svc')
+
+    def child_logger():
+        logger = root.new(request_id='abc123')
+        logger.log("Start")
+        logger.log("Working")
+        logger.log("Done")
+
+    def bound():
+        with bind_context(request_id='abc123'):
+            root.log("Start")
+            root.log("Working")
+            root.log("Done")
+
+    def baseline():
+        root.log("Start")
+        root.log("Working")
+        root.log("Done")
+
+    def attach_child():
+        root.new(request_id='abc123')
+
+    def attach_bound():
+        with bind_context(request_id='abc123'):
+            pass
+
+    for name, f in [('attach: child logger', attach_child), ('attach: bind_context', attach_bound),
+                    ('no request context', baseline), ('child logger', child_logger), ('bind_context', bound)]:
+        print("{:<30} {:8.2f}us/request".format(name, min(timed(f, n) for _ in range(repeat)) * 1e6))
+
+
+class SlowStream(object):
+    """
+    A stream whose writes block for a fixed time, standing in for a slow disk, pipe or network sink.
+    """
+
+    def __init__(self, delay):
+        self._delay = delay
+
+    def write(self, data):
+        time.sleep(self._delay)
+
+    def flush(self):
+        pass
+
+
+def bench_async_lag(n_tasks=10, n_records=100, write_delay=0.0002):
+    """
+    Event loop lag (the delay beyond the requested 1ms for a ticker coroutine to be resumed) while several
+    coroutines log to a sink whose writes block for 0.2ms, with a blocking StreamLogger and with an AsyncLogger
+    in front of the same sink.
+    """
+    async def run(logger):
+        lags = []
+        done = asyncio.Event()
+
+        async def ticker():
+            while not done.is_set():
+                t0 = time.perf_counter()
+                await asyncio.sleep(0.001)
+                lags.append(time.perf_counter() - t0 - 0.001)
+
+        async def worker(i):
+            for j in range(n_records):
+                logger.log("Working", worker=i, item=j)
+                await asyncio.sleep(0)
+
+        tick = asyncio.ensure_future(ticker())
+        t0 = time.perf_counter()
+        await asyncio.gather(*[worker(i) for i in range(n_tasks)])
+        elapsed = time.perf_counter() - t0
+        done.set()
+        await tick
+        if isinstance(logger, AsyncLogger):
+            await logger.aclose()
+        return elapsed, lags
+
+    loop = asyncio.new_event_loop()
+    sink = StreamLogger(SlowStream(write_delay), name='svc')
+    for name, logger in [('StreamLogger', sink), ('AsyncLogger', AsyncLogger(sink, name='svc'))]:
+        elapsed, lags = loop.run_until_complete(run(logger))
+        print("{:<15} logging took {:7.1f}ms, loop lag mean {:7.2f}ms max {:7.2f}ms".format(
+            name, elapsed * 1e3, 1e3 * sum(lags) / max(1, len(lags)), 1e3 * max(lags or [0])))
+    loop.close()
+
+
+def bench_ring_buffer(n=100000):
+    """
+    Cost of a DEBUG entry written straight out by a StreamLogger (to a null stream) against being held in a
+    RingBufferLogger, which only constructs the entries it writes out.
+    """
+    class NullStream(object):
+        def write(self, data):
+            pass
+
+    stream = StreamLogger(NullStream(), level='DEBUG', name='svc').new(name='db')
+    ring = RingBufferLogger(BufferedLogger(), capacity=1000, name='svc').new(name='db')
+
+    for name, logger in [('StreamLogger', stream), ('RingBufferLogger', ring)]:
+        elapsed = timed(lambda: logger.log("Fetching", level='DEBUG', page=1), n)
+        print("{:<20} {:8.2f}us/entry".format(name, elapsed * 1e6))
+
+    t0 = time.perf_counter()
+    ring.log("Failed", level='ERROR')
+    print("{:<20} {:8.2f}ms to dump 1000 entries".format('', (time.perf_counter() - t0) * 1e3))
+
+
+def bench_metrics(n=200000):
+    """
+    Overhead of the log_metrics instrumentation on Logger.log to a NullLogger, disabled and enabled. When disabled
+    each written entry passes two checks of log_metrics.active, the cost of which is measured directly for comparison.
+    """
+    logger = NullLogger(name='svc').new(name='db')
+    suppressed = NullLogger(level='WARNING', name='svc')
+
+    log_metrics.disable()
+    disabled = timed(lambda: logger.log("Hello"), n)
+    disabled_suppressed = timed(lambda: suppressed.log("Hello"), n)
+
+    log_metrics.enable()
+    enabled = timed(lambda: logger.log("Hello"), n)
+    enabled_suppressed = timed(lambda: suppressed.log("Hello"), n)
+    snapshot = log_metrics.snapshot()
+    log_metrics.disable()
+
+    check = timed(lambda: (log_metrics.active is None, log_metrics.active is None), n) - timed(lambda: None, n)
+
+    print("{:<30} {:8.3f}us/entry".format('disabled', disabled * 1e6))
+    print("{:<30} {:8.3f}us/entry".format('enabled', enabled * 1e6))
+    print("{:<30} {:8.3f}us/entry ({:.1f}% of a disabled entry)".format(
+        'cost of disabled checks', check * 1e6, 100 * check / disabled))
+    print("{:<30} {:8.3f}us/entry".format('below level, disabled', disabled_suppressed * 1e6))
+    print("{:<30} {:8.3f}us/entry".format('below level, enabled', enabled_suppressed * 1e6))
+    for name, h in sorted(snapshot['histograms'].items()):
+        print("{:<30} p50 {:6d}ns p99 {:6d}ns max {:8d}ns".format(name, h['p50'], h['p99'], h['max']))
+
+
+def bench_levels(n=200000):
+    """
+    Cost of a DEBUG entry dropped by the level check, for a logger nested four deep, with no level registry, a
+    process local LevelRegistry and a SharedLevelRegistry (each holding levels for other subtrees).
+    """
+    logger = NullLogger(name='svc').new(name='db').new(name='pool').new(name='conn')
+
+    registries = [('no registry', None), ('LevelRegistry', log_levels.LevelRegistry()),
+                  ('SharedLevelRegistry', log_levels.SharedLevelRegistry())]
+    for name, registry in registries:
+        if registry is None:
+            log_levels.uninstall()
+        else:
+            log_levels.install(registry)
+            for prefix in ('svc.api', 'svc.cache', 'worker'):
+                registry.set_level(prefix, 'DEBUG')
+            registry.set_level('svc.db', 'WARNING')
+        print("{:<30} {:8.3f}us/entry".format(name, timed(lambda: logger.log("Hello", level='DEBUG'), n) * 1e6))
+    log_levels.uninstall()
+
+
+class LegacyPickled(object):
+    """
+    Pickles a queue logger the way AutomatedMpQueueLogger used to: its full context hierarchy, level and queue
+    proxy, all rebuilt (and the queue reconnected) for every task.
+    """
+
+    def __init__(self, logger):
+        self.state = {'_context': logger._context, '_level': logger._level, '_q': logger._q}
+
+    def __reduce__(self):
+        return _legacy_restore, (self.state,)
+
+
+def _legacy_restore(state):
+    logger = MpQueueLogger.__new__(MpQueueLogger)
+    logger.__dict__.update(state, _reduce_context=flatten_context, _parent=None, _next=None)
+    return logger
+
+
+def _pool_task(i, logger=None):
+    if logger is not None:
+        logger.log("Task", i=i)
+    return i
+
+
+def bench_pool_map(n=2000, processes=4):
+    """
+    Per-task overhead of pool.map when each task is given a logger (nested three deep) and logs one entry, with the
+    previous pickling of queue loggers, the compact wire form, and the wire form with the logger's definition
+    registered by the pool's initializer (see pool_registration). Tasks are submitted one per chunk.
+    """
+    root = AutomatedMpQueueLogger(name='svc')
+    logger = root.new(name='jobs').new(name='batch')
+
+    def timed_map(pool, name, task_logger):
+        t0 = time.perf_counter()
+        pool.map(functools.partial(_pool_task, logger=task_logger), range(n), chunksize=1)
+        print("{:<30} {:8.1f}us/task".format(name, (time.perf_counter() - t0) / n * 1e6))
+
+    with multiprocessing.Pool(processes) as pool:
+        pool.map(_pool_task, range(processes * 10))  # warm up the workers
+        for name, task_logger in [('no logger', None), ('legacy pickling', LegacyPickled(logger)),
+                                  ('wire form', logger)]:
+            timed_map(pool, name, task_logger)
+
+    initializer, initargs, pool_logger = logger.pool_registration()
+    with multiprocessing.Pool(processes, initializer, initargs) as pool:
+        pool.map(_pool_task, range(processes * 10))
+        timed_map(pool, 'wire form, registered', pool_logger)
+
+
+def bench_startup(n=1000):
+    """
+    Startup cost of AutomatedMpQueueLogger, now its queue is created on first use: construction (with a clone),
+    and the latency of the first entry (which creates the queue) versus later ones, with managed and plain queues.
+    Creating the queue up front, as construction used to, is shown for comparison.
+    """
+    loggers = []  # Kept alive until the end, so that shutting down managers isn't timed
+    for name, managed in [('managed', True), ('plain', False)]:
+        constructed = timed(lambda: loggers.append(AutomatedMpQueueLogger(managed=managed, name='svc').new()), n)
+
+        t0 = time.perf_counter()
+        eager = AutomatedMpQueueLogger(managed=managed, name='svc')
+        eager._q.queue
+        eager_constructed = time.perf_counter() - t0
+        loggers.append(eager)
+
+        logger = AutomatedMpQueueLogger(managed=managed, name='svc')
+        loggers.append(logger)
+        t0 = time.perf_counter()
+        logger.log("First")
+        first = time.perf_counter() - t0
+        later = timed(lambda: logger.log("Later"), n)
+
+        print("{:<10} construct {:8.3f}ms (eager {:8.3f}ms), first log {:8.3f}ms, later logs {:8.3f}ms".format(
+            name, constructed * 1e3, eager_constructed * 1e3, first * 1e3, later * 1e3))
+        # Drain the queue, as a plain queue's feeder thread can't exit while the queue's pipe is full
+        logger.end_logging()
+        log_worker(logger._q, NullLogger())
+
+
+def bench_ndjson(n=200000):
+    """
+    Records/sec serialising typical log entries (the details dictionaries passed to _write_to_log) with
+    StreamLogger's str(details), a naive json.dumps per entry, and NdjsonLogger; then parsing the NDJSON back with
+    read_ndjson.
+    """
+    entries = [NullLogger(name='svc').new(name='worker{}'.format(i % 8))._details(
+        "Processed item", Level.INFO, {'item': i, 'path': '/data/in/{}.csv'.format(i)}) for i in range(1000)]
+
+    class JsonDumpsLogger(StreamLogger):
+        def _write_to_log(self, details):
+            self._stream.write(json.dumps(details) + "\n")
+
+    for name, logger in [('str(details)', StreamLogger(io.StringIO())),
+                         ('json.dumps', JsonDumpsLogger(io.StringIO())),
+                         ('NdjsonLogger', NdjsonLogger(io.BytesIO()))]:
+        write = logger._write_to_log
+        t0 = time.perf_counter()
+        for i in range(n):
+            write(entries[i % 1000])
+        elapsed = time.perf_counter() - t0
+        print("{:<30} {:10.0f} records/sec".format(name, n / elapsed))
+
+    with tempfile.NamedTemporaryFile(suffix='.ndjson', delete=False) as f:
+        logger = NdjsonLogger(f)
+        for i in range(n):
+            logger._write_to_log(entries[i % 1000])
+        logger.end_logging()
+    try:
+        # The pool is forced (min_parallel_size=0) to show its cost on a file below the default threshold
+        for name, processes in [('read_ndjson, 1 process', 1), ('read_ndjson, pool of 4', 4)]:
+            t0 = time.perf_counter()
+            count = sum(1 for _ in read_ndjson(f.name, processes, chunk_size=2 ** 20, min_parallel_size=0))
+            print("{:<30} {:10.0f} records/sec".format(name, count / (time.perf_counter() - t0)))
+    finally:
+        os.remove(f.name)
+
+
+BENCHMARKS = {name[len('bench_'):]: f for name, f in list(globals().items()) if name.startswith('bench_')}
+
+
+if __name__ == '__main__':
+    for name in sys.argv[1:] or sorted(BENCHMARKS):
+        print("== {}: {}".format(name, ' '.join(BENCHMARKS[name].__doc__.split())))
+        BENCHMARKS[name]()
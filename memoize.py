@@ -1,13 +1,132 @@
+import hashlib
+import pickle
+import struct
 from functools import wraps
 
 
-def memoize(f):
+def default_key(args, kwargs):
+    """
+    Keys calls by the arguments themselves, so they must be hashable. Each lookup hashes the arguments in full.
+    """
+    return args, tuple(kwargs.items())
+
+
+def content_key(args, kwargs):
+    """
+    Keys calls by a digest of the arguments' content, so unhashable arguments such as lists, dicts and arrays may
+    be used. Objects supporting the buffer protocol (bytes, bytearray, array.array, numpy arrays) are digested
+    directly from their memory, along with their format and shape. Lists, tuples, dicts and sets are encoded
+    canonically, so e.g. dicts with the same items in a different order give the same key, but a list and a tuple
+    with the same items don't. Anything else is digested by its pickle.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    _digest_into(h, args)
+    _digest_into(h, kwargs)
+    return h.digest()
+
+
+_SCALAR_TAGS = {int: b'i', float: b'f', bool: b'?', type(None): b'n'}
+
+# Types whose repr is a canonical, unambiguous encoding
+_REPR_SAFE = frozenset([str, int, float, bool, type(None)])
+
+
+def _digest(value):
+    h = hashlib.blake2b(digest_size=16)
+    _digest_into(h, value)
+    return h.digest()
+
+
+def _update(h, tag, data):
+    h.update(tag + struct.pack('<Q', len(data)))
+    h.update(data)
+
+
+def _digest_into(h, value):
+    t = type(value)
+    if t is str:
+        _update(h, b's', value.encode('utf-8', 'surrogatepass'))
+    elif t in _SCALAR_TAGS:
+        _update(h, _SCALAR_TAGS[t], repr(value).encode('ascii'))
+    elif t is tuple or t is list:
+        if _REPR_SAFE.issuperset(map(type, value)):
+            # Flat sequences of scalars (the common case) are encoded in one go by their repr, which is much faster
+            _update(h, b'r', repr(value).encode('utf-8', 'surrogatepass'))
+            return
+        h.update((b't' if t is tuple else b'l') + struct.pack('<Q', len(value)))
+        for item in value:
+            _digest_into(h, item)
+    elif t is dict:
+        key_types = set(map(type, value))
+        if len(key_types) == 1 and _REPR_SAFE.issuperset(key_types):
+            # Keys of a single scalar type can be ordered directly
+            items = sorted(value.items())
+            if _REPR_SAFE.issuperset(map(type, value.values())):
+                _update(h, b'R', repr(items).encode('utf-8', 'surrogatepass'))
+                return
+        else:
+            items = sorted(((_digest(k), v) for k, v in value.items()), key=lambda item: item[0])
+        h.update(b'd' + struct.pack('<Q', len(value)))
+        for k, v in items:
+            _digest_into(h, k)
+            _digest_into(h, v)
+    elif t is set or t is frozenset:
+        h.update(b'e' + struct.pack('<Q', len(value)))
+        for digest in sorted(_digest(item) for item in value):
+            h.update(digest)
+    else:
+        try:
+            m = memoryview(value)
+        except TypeError:
+            _update(h, b'p', pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+            return
+        with m:
+            header = '{}:{}:{}'.format(t.__name__, m.format, m.shape).encode('utf-8')
+            _update(h, b'b', header)
+            h.update(m if m.c_contiguous else m.tobytes())
+
+
+class _Identity(object):
+    """
+    Wraps an argument so that it's hashed and compared by identity and version. Holds a reference to the argument,
+    so that its id can't be reused by another object while the key is cached.
+    """
+
+    __slots__ = ('obj', 'version')
+
+    def __init__(self, obj):
+        self.obj = obj
+        self.version = getattr(obj, 'version', None)
+
+    def __hash__(self):
+        return hash((id(self.obj), self.version))
+
+    def __eq__(self, other):
+        return self.obj is other.obj and self.version == other.version
+
+
+def identity_key(args, kwargs):
+    """
+    Keys calls by the identity of the arguments, plus their 'version' attribute if they have one, so a hit costs the
+    same however large the arguments are. Intended for large objects which are immutable, or which bump their
+    version on modification. Note the cache keeps every argument it has seen alive.
+    """
+    return tuple(map(_Identity, args)), tuple((k, _Identity(v)) for k, v in kwargs.items())
+
+
+def memoize(f=None, key=default_key):
+    """
+    Caches the results of calls to f, by a key built from the arguments by the key function (see default_key,
+    content_key and identity_key). May be used as @memoize, or @memoize(key=content_key).
+    """
+    if f is None:
+        return lambda f: memoize(f, key)
+
     cache = {}
 
     @wraps(f)
     def wrapper(*args, **kwargs):
-        keyword_items = tuple(kwargs.items())
-        cache_key = (args, keyword_items)
+        cache_key = key(args, kwargs)
         if cache_key in cache:
             return cache[cache_key]
         result = f(*args, **kwargs)
@@ -1,5 +1,5 @@
-import functools
-import operator
+import heapq
+import itertools
 
 list1 = [1, 2]
 list2 = [1, 3, 5, 7, 9]
@@ -8,7 +8,50 @@ list4 = [7, 2, 4]
 
 
 def mergelist(*args):
-    return functools.reduce(operator.add, args) if args else []
+    """
+    Concatenate the given iterables into a single new list.
+    """
+    return list(iter_chain(*args))
 
 
-print(mergelist(list2, list3, list4))
+def iter_chain(*iterables):
+    """
+    Lazily concatenate the given iterables (lists, generators, files, ...), one after the other. Nothing is copied
+    or materialised, so memory use is independent of the input sizes.
+    """
+    return itertools.chain.from_iterable(iterables)
+
+
+def merge_sorted(*iterables, key=None, reverse=False, unique=False):
+    """
+    Lazily merge iterables which are each already sorted (by key, and in the same direction as reverse) into a
+    single sorted stream. Uses a heap holding one item per input, so n items over k inputs are merged in
+    O(n log k) time and O(k) memory. E.g.
+
+    >>> list(merge_sorted([1, 3, 5], [1, 2, 3], unique=True))
+    [1, 2, 3, 5]
+
+    :param iterables: sorted iterables, such as sequences, generators or files of sorted lines.
+    :param key: optional function of one argument used to extract the comparison key from each item.
+    :param reverse: set if the inputs are sorted in descending order.
+    :param unique: if set, items with an equal key to their predecessor in the output are dropped.
+    """
+    merged = heapq.merge(*iterables, key=key, reverse=reverse)
+    return _unique(merged, key) if unique else merged
+
+
+def _unique(sorted_iter, key=None):
+    sentinel = object()
+    last = sentinel
+    for item in sorted_iter:
+        k = key(item) if key else item
+        if last is sentinel or k != last:
+            last = k
+            yield item
+
+
+if __name__ == '__main__':
+    print(mergelist(list2, list3, list4))
+    print(list(iter_chain(list2, (x * 10 for x in list3))))
+    print(list(merge_sorted(list1, list2, list3)))
+    print(list(merge_sorted(list1, list2, list3, unique=True)))
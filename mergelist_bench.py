@@ -0,0 +1,75 @@
+"""
+Benchmarks for mergelist. For each k, n items are spread over k sorted inputs and merged by:
+
+    reduce      - the previous functools.reduce(operator.add, ...) implementation
+    mergelist   - concatenation into a single list
+    iter_chain  - lazy concatenation, consumed without materialising
+    sorted      - sorted(mergelist(...)), the naive way to merge sorted inputs
+    merge       - merge_sorted, consumed without materialising
+    merge_uniq  - merge_sorted with unique=True
+
+Peak traced memory is reported for the lazy merge over generator inputs, which should be O(k) rather than O(n).
+Note that tracemalloc slows that run, so its timing isn't comparable to the others.
+
+    python mergelist_bench.py [n_items] [k ...]
+"""
+import collections
+import functools
+import operator
+import sys
+import time
+import tracemalloc
+
+from mergelist import iter_chain, merge_sorted, mergelist
+
+
+def consume(iterable):
+    collections.deque(iterable, maxlen=0)
+
+
+def timed(f, *args):
+    t0 = time.perf_counter()
+    f(*args)
+    return time.perf_counter() - t0
+
+
+def sorted_inputs(n, k):
+    # k interleaved sorted lists, with duplicates across lists, totalling n items
+    per_list = n // k
+    return [list(range(i % 7, i % 7 + 2 * per_list, 2)) for i in range(k)]
+
+
+def sorted_generators(n, k):
+    per_list = n // k
+    return [(x for x in range(i % 7, i % 7 + 2 * per_list, 2)) for i in range(k)]
+
+
+def main(n=10 ** 6, ks=(2, 10, 100, 1000)):
+    columns = ['reduce', 'mergelist', 'iter_chain', 'sorted', 'merge', 'merge_uniq']
+    print("n = {} items".format(n))
+    print("{:>6} ".format('k') + ' '.join('{:>11}'.format(c) for c in columns) + " {:>14}".format('merge peak KiB'))
+
+    for k in ks:
+        lists = sorted_inputs(n, k)
+        timings = [
+            timed(lambda: functools.reduce(operator.add, lists)),
+            timed(lambda: mergelist(*lists)),
+            timed(lambda: consume(iter_chain(*lists))),
+            timed(lambda: sorted(mergelist(*lists))),
+            timed(lambda: consume(merge_sorted(*lists))),
+            timed(lambda: consume(merge_sorted(*lists, unique=True))),
+        ]
+        del lists
+
+        tracemalloc.start()
+        consume(merge_sorted(*sorted_generators(n, k)))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print("{:>6} ".format(k) + ' '.join('{:>9.1f}ms'.format(t * 1e3) for t in timings) +
+              " {:>14.1f}".format(peak / 1024))
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:]]
+    main(*([args[0], args[1:]] if len(args) > 1 else args))
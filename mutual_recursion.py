@@ -1,5 +1,7 @@
 from enum import Enum
 
+from state_machine import StateMachine
+
 
 class Command(Enum):
     OPEN = 0
@@ -56,6 +58,35 @@ def elevator(*commands):
     return ff_open(*commands)
 
 
-print(elevator(Command.CLOSE, Command.OPEN, Command.CLOSE, Command.UP, Command.OPEN, Command.OPEN, Command.DONE))
-print(elevator(Command.CLOSE, Command.UP, Command.OPEN, Command.CLOSE, Command.DOWN, Command.OPEN, Command.DONE))
+def elevator_machine(verbose=False):
+    """
+    A table-driven equivalent of elevator, which runs in O(1) per command without recursion, so isn't limited in
+    the number of commands it can process. E.g. elevator_machine().run(commands)
+    """
+    def announce(state, command, next_state):
+        print(next_state)
+
+    def t(next_state):
+        return (next_state, announce) if verbose else next_state
+
+    return StateMachine({
+        ('First-floor open', Command.CLOSE): t('First-floor closed'),
+        ('First-floor open', Command.DONE): t('Done'),
+        ('First-floor closed', Command.OPEN): t('First-floor open'),
+        ('First-floor closed', Command.UP): t('Second-floor closed'),
+        ('Second-floor closed', Command.OPEN): t('Second-floor open'),
+        ('Second-floor closed', Command.DOWN): t('First-floor closed'),
+        ('Second-floor open', Command.CLOSE): t('Second-floor closed'),
+        ('Second-floor open', Command.DONE): t('Done'),
+    }, initial='First-floor open', final=['Done'])
+
+
+if __name__ == '__main__':
+    print(elevator(Command.CLOSE, Command.OPEN, Command.CLOSE, Command.UP, Command.OPEN, Command.OPEN, Command.DONE))
+    print(elevator(Command.CLOSE, Command.UP, Command.OPEN, Command.CLOSE, Command.DOWN, Command.OPEN, Command.DONE))
 
+    machine = elevator_machine(verbose=True)
+    print(machine.run([Command.CLOSE, Command.OPEN, Command.CLOSE, Command.UP, Command.OPEN, Command.OPEN,
+                       Command.DONE]))
+    print(machine.run([Command.CLOSE, Command.UP, Command.OPEN, Command.CLOSE, Command.DOWN, Command.OPEN,
+                       Command.DONE]))
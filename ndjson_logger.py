@@ -0,0 +1,164 @@
+import copy
+import json
+import os
+import threading
+from json.encoder import encode_basestring
+from multiprocessing import Pool
+
+from logger import Logger
+
+
+_ENCODERS = {
+    str: encode_basestring,
+    int: int.__repr__,
+    float: json.dumps,
+    bool: lambda value: 'true' if value else 'false',
+    type(None): lambda value: 'null',
+}
+
+
+def _encode_value(value):
+    encode = _ENCODERS.get(type(value))
+    if encode is not None:
+        return encode(value)
+    if isinstance(value, (int, float)):
+        return json.dumps(value)
+    return encode_basestring(str(value))
+
+
+class NdjsonLogger(Logger):
+    """
+    logger implementation which writes each log entry as a line of JSON (NDJSON) to a binary stream, so that output
+    can be reliably parsed by downstream tools (see read_ndjson).
+
+    Serialisation is specialised for log entries: for each distinct set of keys (which follows from the shape of the
+    flattened context) a line template with the keys already encoded is cached, so only the values need encoding.
+    String values go through json's C string encoder, which only escapes quotes, backslashes and control characters,
+    writing anything else as UTF-8 as is; shapes whose values have all been strings are encoded in one go by it, and
+    others by the type of each value. Lines are accumulated in a reused bytearray, which is written out once it
+    holds buffer_size bytes (or on flush/end_logging); a buffer_size of 0 writes every entry immediately. Loggers
+    created with new() share the buffer.
+    """
+
+    def __init__(self, stream, level=None, buffer_size=64 * 1024, **context):
+        super(NdjsonLogger, self).__init__(level, **context)
+        self._stream = stream
+        self._buffer_size = buffer_size
+        self._buffer = bytearray()
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    def clone(self):
+        return copy.copy(self)
+
+    def _template(self, keys):
+        template = self._templates.get(keys)
+        if template is None:
+            # e.g. ['{"level":%s,"msg":%s, ...}\n', True], the flag being whether the values have all been strings
+            fields = ','.join(json.dumps(k, ensure_ascii=False).replace('%', '%%') + ':%s' for k in keys)
+            template = self._templates[keys] = ['{' + fields + '}\n', True]
+        return template
+
+    def _write_to_log(self, details):
+        template = self._template(tuple(details))
+        line = None
+        if template[1]:
+            try:
+                line = template[0] % tuple(map(encode_basestring, details.values()))
+            except TypeError:
+                # Not every value is a string, so for this shape of entry don't try again
+                template[1] = False
+        if line is None:
+            line = template[0] % tuple(map(_encode_value, details.values()))
+        data = line.encode('utf-8')
+
+        with self._lock:
+            self._buffer += data
+            if len(self._buffer) >= self._buffer_size:
+                self._flush_buffer()
+
+    def _flush_buffer(self):
+        if self._buffer:
+            self._stream.write(self._buffer)
+            self._buffer.clear()
+
+    def flush(self):
+        with self._lock:
+            self._flush_buffer()
+            self._stream.flush()
+
+    def end_logging(self):
+        self.flush()
+
+
+def _chunk_offsets(path, chunks):
+    """
+    Split the file into roughly equal byte ranges, each ending on a line boundary.
+    """
+    size = os.path.getsize(path)
+    offsets = [0]
+    with open(path, 'rb') as f:
+        for i in range(1, chunks):
+            f.seek(max(offsets[-1], size * i // chunks))
+            f.readline()
+            if f.tell() >= size:
+                break
+            if f.tell() > offsets[-1]:
+                offsets.append(f.tell())
+    offsets.append(size)
+    return list(zip(offsets[:-1], offsets[1:]))
+
+
+def _parse_chunk(args):
+    path, start, end = args
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return [json.loads(line) for line in data.splitlines() if line.strip()]
+
+
+def read_ndjson(path, processes=None, chunk_size=8 * 2 ** 20, min_parallel_size=64 * 2 ** 20):
+    """
+    Iterate the records of an NDJSON file in order, parsing chunks of the file (of roughly chunk_size bytes) in
+    parallel, one chunk per task on a process pool of the given size (by default, one process per CPU).
+
+    The pool only pays for itself on large files with several CPUs to spare: each chunk's records are pickled back
+    to this process, and unpickling them costs a good part of what parsing them in process would, on top of
+    starting the pool. So files smaller than min_parallel_size bytes, files of a single chunk, and pools of a single
+    process are parsed in process.
+    """
+    size = os.path.getsize(path)
+    if processes is None:
+        processes = os.cpu_count() or 1
+    chunks = max(1, size // chunk_size)
+    if size < min_parallel_size or chunks == 1 or processes < 2:
+        for record in _parse_chunk((path, 0, size)):
+            yield record
+        return
+    tasks = [(path, start, end) for start, end in _chunk_offsets(path, chunks)]
+    with Pool(processes) as pool:
+        for records in pool.imap(_parse_chunk, tasks):
+            for record in records:
+                yield record
+
+
+if __name__ == '__main__':
+    import sys
+    import tempfile
+
+    stdout = NdjsonLogger(sys.stdout.buffer, buffer_size=0, name='svc')
+    stdout.log("Hello")
+    stdout.new(name='db').log('Quoted "message"\nwith a newline', rows=3, ratio=0.5, ok=True, user=u'Zo\xeb')
+
+    with tempfile.NamedTemporaryFile(suffix='.ndjson', delete=False) as f:
+        path = f.name
+    with open(path, 'ab') as f:
+        logger = NdjsonLogger(f, name='svc')
+        for i in range(100000):
+            logger.new(name='worker{}'.format(i % 4)).log("Processed", item=i)
+        logger.end_logging()
+
+    records = list(read_ndjson(path, processes=2, chunk_size=2 ** 20, min_parallel_size=0))
+    assert [r['item'] for r in records] == list(range(100000))
+    print("Read back {} records from {}".format(len(records), path))
+    os.remove(path)
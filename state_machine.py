@@ -0,0 +1,125 @@
+class StateMachine(object):
+    """
+    A table-driven finite state machine. The transitions are given as a dict of (state, event) -> next_state, or
+    (state, event) -> (next_state, action) where action is a callable taking (state, event, next_state), and
+    compiled into a flat lookup table of integer codes. Running the machine is then a loop doing one table lookup
+    per event, so consumes any iterator of events in O(1) per step with no recursion (and so no stack limit).
+
+    A run ends once a final state is reached (any remaining events are ignored), or is rejected on an event with no
+    transition from the current state. E.g.
+
+    >>> m = StateMachine({('off', 'push'): 'on', ('on', 'push'): 'off', ('on', 'stop'): 'done'}, 'off', ['done'])
+    >>> m.run(['push', 'push', 'push', 'stop'])
+    True
+    >>> m.run(['push', 'push', 'stop'])
+    False
+
+    Many independent machines may be run together with run_many, or with run_vectorized over NumPy arrays of
+    event codes (see encode).
+    """
+
+    def __init__(self, transitions, initial, final=()):
+        final = set(final)
+        states = set([initial]) | final
+        for (state, event), target in transitions.items():
+            states.add(state)
+            states.add(target[0] if isinstance(target, tuple) else target)
+
+        # Order the state codes as live states, then final states, then the reject state, so that a single
+        # comparison (code >= self.n_live) tells whether a run has ended
+        live = sorted((s for s in states if s not in final), key=repr)
+        self.states = live + sorted(final, key=repr) + [None]
+        self.n_live = len(live)
+        self.reject = len(self.states) - 1
+        self.state_codes = {s: i for i, s in enumerate(self.states[:-1])}
+
+        self.events = sorted(set(event for _, event in transitions), key=repr)
+        self.event_codes = {e: i for i, e in enumerate(self.events)}
+        # Two extra event columns: PAD, a no-op used to pad streams of differing lengths in run_vectorized, and
+        # UNKNOWN, for events not in the table, which always rejects
+        self.pad = len(self.events)
+        self.unknown = self.pad + 1
+        self.width = self.unknown + 1
+
+        # Terminal states (final and reject) transition to themselves on every event
+        self.table = [s if s >= self.n_live else self.reject
+                      for s in range(len(self.states)) for _ in range(self.width)]
+        for s in range(len(self.states)):
+            self.table[s * self.width + self.pad] = s
+
+        self.actions = {}
+        for (state, event), target in transitions.items():
+            target, action = target if isinstance(target, tuple) else (target, None)
+            index = self.state_codes[state] * self.width + self.event_codes[event]
+            self.table[index] = self.state_codes[target]
+            if action:
+                self.actions[index] = action
+
+        self.initial = self.state_codes[initial]
+
+    def encode(self, events):
+        """
+        Translate events into a list of integer event codes, as used by run_vectorized.
+        """
+        get, unknown = self.event_codes.get, self.unknown
+        return [get(e, unknown) for e in events]
+
+    def run_state(self, events, state=None):
+        """
+        Run the machine over the events from the given (or initial) state, returning the state it ends in, or
+        None if it was rejected.
+        """
+        s = self.initial if state is None else self.state_codes[state]
+        table, width, n_live = self.table, self.width, self.n_live
+        get, unknown = self.event_codes.get, self.unknown
+        actions = self.actions
+
+        if s < n_live:
+            if actions:
+                states = self.states
+                for e in events:
+                    index = s * width + get(e, unknown)
+                    s = table[index]
+                    action = actions.get(index)
+                    if action:
+                        action(states[index // width], e, states[s])
+                    if s >= n_live:
+                        break
+            else:
+                for e in events:
+                    s = table[s * width + get(e, unknown)]
+                    if s >= n_live:
+                        break
+
+        return self.states[s]
+
+    def run(self, events, state=None):
+        """
+        Returns True if the events take the machine into a final state, False if rejected or the events run out.
+        """
+        s = self.run_state(events, state)
+        return s is not None and self.state_codes[s] >= self.n_live
+
+    def run_many(self, streams):
+        """
+        Run an independent machine for each stream of events, returning a list of run results.
+        """
+        return [self.run(events) for events in streams]
+
+    def run_vectorized(self, event_codes, states=None):
+        """
+        Step many machines at once, one event per machine per step, using NumPy. Actions are not called.
+
+        :param event_codes: an integer array of shape (n_machines, n_steps) of event codes (see encode). Shorter
+            streams may be padded with self.pad.
+        :param states: optional array of initial state codes, one per machine.
+        :return: a boolean array, True for each machine which ended in a final state.
+        """
+        import numpy as np
+
+        event_codes = np.asarray(event_codes)
+        table = np.asarray(self.table).reshape(len(self.states), self.width)
+        s = np.full(event_codes.shape[0], self.initial) if states is None else np.asarray(states)
+        for step in range(event_codes.shape[1]):
+            s = table[s, event_codes[:, step]]
+        return (s >= self.n_live) & (s != self.reject)
@@ -0,0 +1,66 @@
+"""
+Benchmarks the table-driven elevator state machine against the mutually recursive mutual_recursion.elevator, which
+is O(n^2) in the number of commands and limited by the recursion limit, so is only timed on short streams.
+
+    python state_machine_bench.py [n_commands] [n_machines]
+"""
+import contextlib
+import io
+import itertools
+import sys
+import time
+
+from mutual_recursion import Command, elevator, elevator_machine
+
+
+def commands(n):
+    # A valid ride of n commands: shuttle between floors, then return to the first floor, open up and finish
+    cycle = [Command.CLOSE, Command.UP, Command.OPEN, Command.CLOSE, Command.DOWN, Command.OPEN]
+    ride = list(itertools.islice(itertools.cycle(cycle), max(0, n - 1 - (n - 1) % len(cycle))))
+    return ride + [Command.DONE]
+
+
+def timed(f, *args):
+    t0 = time.perf_counter()
+    result = f(*args)
+    return result, time.perf_counter() - t0
+
+
+def main(n=10 ** 6, n_machines=1000):
+    machine = elevator_machine()
+
+    print("{:>10} {:>14} {:>14}".format('commands', 'recursive', 'table'))
+    for size in (100, 400, 900):
+        stream = commands(size)
+        with contextlib.redirect_stdout(io.StringIO()):
+            expected, recursive = timed(elevator, *stream)
+        result, table = timed(machine.run, stream)
+        assert result == expected
+        print("{:>10} {:>12.3f}ms {:>12.3f}ms".format(len(stream), recursive * 1e3, table * 1e3))
+
+    stream = commands(n)
+    result, table = timed(machine.run, stream)
+    assert result
+    print("{:>10} {:>14} {:>12.3f}ms ({:.1f}ns/command)".format(len(stream), 'n/a', table * 1e3, table * 1e9 / n))
+
+    result, from_iter = timed(machine.run, iter(stream))
+    print("{:>10} {:>14} {:>12.3f}ms from an iterator".format(len(stream), 'n/a', from_iter * 1e3))
+
+    streams = [commands(n // n_machines)] * n_machines
+    results, batch = timed(machine.run_many, streams)
+    assert all(results)
+    print("run_many: {} machines x {} commands in {:.3f}ms".format(n_machines, n // n_machines, batch * 1e3))
+
+    try:
+        import numpy as np
+    except ImportError:
+        print("run_vectorized: skipped, NumPy is not installed")
+        return
+    codes = np.array([machine.encode(s) for s in streams])
+    results, vectorized = timed(machine.run_vectorized, codes)
+    assert results.all()
+    print("run_vectorized: {} machines x {} commands in {:.3f}ms".format(n_machines, n // n_machines, vectorized * 1e3))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:3]])